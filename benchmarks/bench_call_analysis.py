@@ -0,0 +1,62 @@
+"""
+Show that call analysis scales linearly with module size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_call_analysis --max-lines 64000
+"""
+
+import argparse
+import ast
+import time
+
+from indexer import summarize_tree
+from symbols import SymbolTable
+
+
+def generate_module(num_functions: int):
+    """
+    Source of a module with `num_functions` top-level functions, each with a
+    nested helper, a lambda and a handful of calls.
+    """
+    lines = []
+    for i in range(num_functions):
+        lines += [
+            f"async def func_{i}(value):",
+            f"    def helper_{i}(item):",
+            f"        return func_{(i + 1) % num_functions}(item)",
+            f"    key = lambda item: helper_{i}(item)",
+            f"    await func_{(i + 7) % num_functions}(value)",
+            f"    self.method_{i}(value)",
+            "    return sorted(map(key, [value]), key=key)",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-lines", type=int, default=64000)
+    args = parser.parse_args()
+
+    num_functions = 125
+    while num_functions * 8 <= args.max_lines:
+        source = generate_module(num_functions).encode("utf-8")
+        tree = ast.parse(source)
+        num_nodes = sum(1 for _ in ast.walk(tree))
+
+        # The extraction and call resolution both entry points run
+        start = time.perf_counter()
+        summary = summarize_tree("module.py", tree, source)
+        SymbolTable([summary], ".")
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"lines={num_functions * 8:<7} nodes={num_nodes:<8} "
+            f"time={elapsed * 1000:9.2f}ms per-node={elapsed / num_nodes * 1e9:7.1f}ns"
+        )
+        num_functions *= 2
+
+
+if __name__ == "__main__":
+    main()
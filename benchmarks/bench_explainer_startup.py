@@ -0,0 +1,89 @@
+"""
+Compare startup time and resident memory of the explainer loading modes.
+
+Each mode runs in a fresh interpreter so imports and model weights are not
+shared between measurements. Run from the repository root:
+
+    python -m benchmarks.bench_explainer_startup
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+SAMPLE_CODE = "def add(a, b):\n    return a + b\n"
+
+
+def rss_mb():
+    import psutil
+
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def run_child(mode: str):
+    """
+    Measure one mode in the current process and print the result as JSON.
+    """
+    start = time.perf_counter()
+    import main  # noqa: F401  importing main is what every server start pays for
+    from explainer import Explainer
+
+    explainer = Explainer(quantize=mode == "quantized")
+    if mode in ("eager", "quantized"):
+        explainer.load()
+    startup = time.perf_counter() - start
+    startup_rss = rss_mb()
+
+    start = time.perf_counter()
+    explainer(SAMPLE_CODE)
+    first_explain = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "startup_s": startup,
+                "startup_rss_mb": startup_rss,
+                "first_explain_s": first_explain,
+                "rss_after_explain_mb": rss_mb(),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--child", choices=["eager", "lazy", "quantized"])
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child)
+        return
+
+    print(
+        f"{'mode':<10} {'startup':>9} {'rss@start':>10} "
+        f"{'1st explain':>12} {'rss@explain':>12}"
+    )
+    for mode in ("eager", "lazy", "quantized"):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_explainer_startup",
+                "--child",
+                mode,
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:<10} {result['startup_s']:8.2f}s {result['startup_rss_mb']:8.0f}MB "
+            f"{result['first_explain_s']:11.2f}s {result['rss_after_explain_mb']:10.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare /graph_data before and after payload memoization on a large graph.
+
+"Before" converts and serializes the graph on every request, as
+network_to_visjs + jsonify used to. "After" goes through the route, which
+builds the compressed payload once per graph version and answers
+revalidations with 304. Run from the repository root:
+
+    python -m benchmarks.bench_graph_data --nodes 200000
+"""
+
+import argparse
+import random
+import time
+
+import networkx as nx
+from flask import jsonify
+
+import main as mapper
+
+
+def synthetic_graph(num_nodes: int, edges_per_node: int = 3, seed: int = 0):
+    rng = random.Random(seed)
+    G = nx.DiGraph()
+    for i in range(num_nodes):
+        G.add_node(f"pkg/module_{i // 50}.py::func_{i}", label=f"func_{i}", size=7)
+    nodes = list(G.nodes())
+    for node in nodes:
+        for _ in range(edges_per_node):
+            G.add_edge(node, rng.choice(nodes))
+    return G
+
+
+def timed_get(client, headers=None):
+    start = time.perf_counter()
+    response = client.get("/graph_data", headers=headers or {})
+    return time.perf_counter() - start, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=200000)
+    args = parser.parse_args()
+
+    mapper.graph.install(synthetic_graph(args.nodes), {}, mapper.SourceIndex())
+    client = mapper.app.test_client()
+
+    with mapper.app.test_request_context():
+        start = time.perf_counter()
+        body = jsonify(mapper.network_to_visjs(mapper.graph.G)).get_data()
+        before = time.perf_counter() - start
+    print(
+        f"before:          {before * 1000:9.1f}ms  {len(body) / 1e6:8.2f}MB every request"
+    )
+
+    gzip_headers = {"Accept-Encoding": "gzip, br"}
+    cold, response = timed_get(client, gzip_headers)
+    encoding = response.headers.get("Content-Encoding", "identity")
+    print(
+        f"after, first:    {cold * 1000:9.1f}ms  {len(response.data) / 1e6:8.2f}MB "
+        f"({encoding})"
+    )
+    warm, response = timed_get(client, gzip_headers)
+    print(f"after, repeated: {warm * 1000:9.1f}ms  {len(response.data) / 1e6:8.2f}MB")
+    revalidate, response = timed_get(
+        client, {**gzip_headers, "If-None-Match": response.headers["ETag"]}
+    )
+    print(
+        f"after, 304:      {revalidate * 1000:9.1f}ms  {len(response.data) / 1e6:8.2f}MB "
+        f"(status {response.status_code})"
+    )
+
+
+if __name__ == "__main__":
+    main()
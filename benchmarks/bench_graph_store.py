@@ -0,0 +1,97 @@
+"""
+Compare memory and throughput of the GraphStore against the NetworkX graph
+main.py used to build.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_graph_store --files 2000 --functions-per-file 100
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+import networkx as nx
+
+from benchmarks.synthetic_repo import generate_repo
+from indexer import index_files, merge_summaries
+from main import create_graph_with_directory_structure, network_to_visjs
+
+
+def build_networkx(functions: dict, imports: set, file_paths: list):
+    """
+    The NetworkX construction main.py used before the GraphStore.
+    """
+    G = nx.DiGraph()
+    for file_path in file_paths:
+        module_name = os.path.basename(file_path).replace(".py", "")
+        G.add_node(file_path, label=module_name, color="#FF6B6B", shape="dot", size=15)
+    for module in imports:
+        G.add_node(module, label=module, color="#4ECDC4", shape="dot", size=10)
+    for func_name, func_data in functions.items():
+        G.add_node(func_name, label=func_name, color="#FFFFFF", shape="dot", size=7)
+        if func_data["file"]:
+            G.add_edge(func_data["file"], func_name)
+        for called_func in func_data["calls"]:
+            if called_func in functions:
+                G.add_edge(func_name, called_func)
+    return G
+
+
+def measure(build):
+    """
+    Run `build` and return (result, seconds, retained bytes, peak bytes).
+    Time is measured on a separate untraced run, tracemalloc slows allocation.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--functions-per-file", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        file_paths = generate_repo(root, args.files, args.functions_per_file)
+        functions, imports = merge_summaries(index_files(file_paths))
+
+        print(
+            f"{'graph':<10} {'build':>9} {'retained':>10} {'peak':>10} {'to vis.js':>10}"
+        )
+        for name, build in (
+            ("networkx", lambda: build_networkx(functions, imports, file_paths)),
+            (
+                "store",
+                lambda: create_graph_with_directory_structure(
+                    functions, imports, file_paths
+                ),
+            ),
+        ):
+            G, elapsed, retained, peak = measure(build)
+            start = time.perf_counter()
+            network_to_visjs(G)
+            serialize = time.perf_counter() - start
+            print(
+                f"{name:<10} {elapsed:8.2f}s {retained / 1e6:8.1f}MB "
+                f"{peak / 1e6:8.1f}MB {serialize:9.2f}s"
+            )
+            del G
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Measure how the parallel indexing stage scales with the number of workers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parallel_index --files 2000 --max-jobs 8
+"""
+
+import argparse
+import tempfile
+import time
+
+from indexer import index_files, merge_summaries
+from benchmarks.synthetic_repo import generate_repo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--functions-per-file", type=int, default=40)
+    parser.add_argument("--max-jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        python_files = generate_repo(root, args.files, args.functions_per_file)
+
+        baseline = None
+        reference = None
+        jobs = 1
+        while jobs <= args.max_jobs:
+            start = time.perf_counter()
+            summaries = index_files(python_files, jobs=jobs)
+            elapsed = time.perf_counter() - start
+
+            merged = merge_summaries(summaries)
+            if reference is None:
+                reference = merged
+            assert merged == reference, "merge result depends on the number of workers"
+
+            baseline = baseline or elapsed
+            speedup = baseline / elapsed
+            print(
+                f"jobs={jobs:<3} time={elapsed:7.3f}s speedup={speedup:5.2f}x "
+                f"efficiency={speedup / jobs:6.1%}"
+            )
+            jobs *= 2
+
+
+if __name__ == "__main__":
+    main()
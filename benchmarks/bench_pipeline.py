@@ -0,0 +1,229 @@
+"""
+Time each stage of the indexing pipeline on a synthetic repository and
+record wall time and peak memory as JSON, to compare runs and catch
+regressions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --files 2000 --output run.json
+    python -m benchmarks.bench_pipeline --files 2000 --compare run.json
+"""
+
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic_repo import generate_repo
+from indexer import summarize_tree
+from layout import layout_graph
+from main import (
+    create_graph_with_directory_structure,
+    network_to_visjs,
+    parse_directory,
+)
+from symbols import SymbolTable
+
+RESULT_FORMAT = "codeflowmapper-benchmark"
+RESULT_VERSION = 1
+
+
+def measure(stage, repeat: int = 1, memory: bool = True):
+    """
+    Run `stage` and return (result, best seconds of `repeat` runs, peak
+    bytes). Peak memory comes from one more run under tracemalloc, which
+    slows allocation too much to time.
+    """
+    elapsed = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+        elapsed = seconds if elapsed is None else min(elapsed, seconds)
+
+    peak = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = stage()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def parse_files(file_paths: list):
+    """
+    Read and parse files as indexer.summarize_file does, from their bytes.
+    Returns (path, tree, source) for each file.
+    """
+    parsed = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            source = f.read()
+        parsed.append((file_path, ast.parse(source), source))
+    return parsed
+
+
+def run_pipeline(root: str, repeat: int = 1, memory: bool = True, layout=True):
+    """
+    The stages of `main.py index` in order, each measured on its own.
+    Returns the stage results and counts describing the graph.
+    """
+    stages = []
+
+    def stage(name, run):
+        result, seconds, peak = measure(run, repeat, memory)
+        stages.append({"name": name, "seconds": seconds, "peak_bytes": peak})
+        return result
+
+    file_paths = stage("parse_directory", lambda: parse_directory(root, []))
+    parsed = stage("parse_file", lambda: parse_files(file_paths))
+    # The extraction main.py runs once a file is parsed, spans included
+    summaries = stage(
+        "extraction",
+        lambda: [summarize_tree(*file) for file in parsed],
+    )
+    symbols = stage("call_analysis", lambda: SymbolTable(summaries, root))
+    G = stage(
+        "graph_build",
+        lambda: create_graph_with_directory_structure(
+            symbols.functions, symbols.imports, file_paths
+        ),
+    )
+    if layout:
+        stage("layout", lambda: G.set_layout(*layout_graph(G)))
+    data = stage("network_to_visjs", lambda: network_to_visjs(G))
+    body = stage("json_serialization", lambda: json.dumps(data))
+
+    counts = {
+        "files": len(file_paths),
+        "functions": len(symbols.functions),
+        "resolved_calls": symbols.resolved,
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "payload_bytes": len(body),
+    }
+    return stages, counts
+
+
+def compare(current: dict, previous: dict, tolerance: float):
+    """
+    Print each stage's time against a previous run. Returns the names of the
+    stages that got slower by more than `tolerance`.
+    """
+    before = {stage["name"]: stage for stage in previous["stages"]}
+    regressions = []
+    for stage in current["stages"]:
+        old = before.get(stage["name"])
+        if old is None or not old["seconds"]:
+            continue
+        ratio = stage["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(stage["name"])
+            flag = "  REGRESSION"
+        print(
+            f"{stage['name']:<20} {old['seconds']:8.3f}s -> {stage['seconds']:8.3f}s "
+            f"{ratio:6.2f}x{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--functions-per-file", type=int, default=20)
+    parser.add_argument("--fan-out", type=int, default=3)
+    parser.add_argument("--nesting-depth", type=int, default=1)
+    parser.add_argument("--package-depth", type=int, default=2)
+    parser.add_argument(
+        "--cross-module",
+        type=float,
+        default=0.3,
+        help="Share of calls that go to functions of other files.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Best of N timings.")
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--no-layout", action="store_true")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Results of an earlier run to compare to.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Slowdown per stage accepted by --compare before failing.",
+    )
+    args = parser.parse_args()
+
+    params = {
+        "files": args.files,
+        "functions_per_file": args.functions_per_file,
+        "fan_out": args.fan_out,
+        "nesting_depth": args.nesting_depth,
+        "package_depth": args.package_depth,
+        "cross_module": args.cross_module,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "layout": not args.no_layout,
+    }
+    with tempfile.TemporaryDirectory() as root:
+        generate_repo(
+            root,
+            args.files,
+            args.functions_per_file,
+            args.seed,
+            args.fan_out,
+            args.nesting_depth,
+            args.package_depth,
+            args.cross_module,
+        )
+        stages, counts = run_pipeline(
+            root, args.repeat, not args.no_memory, not args.no_layout
+        )
+
+    result = {
+        "format": RESULT_FORMAT,
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "counts": counts,
+        "stages": stages,
+        "total_seconds": sum(stage["seconds"] for stage in stages),
+    }
+
+    print(f"{'stage':<20} {'time':>9} {'peak':>10}")
+    for stage in stages:
+        peak = stage["peak_bytes"]
+        peak = "" if peak is None else f"{peak / 1e6:8.1f}MB"
+        print(f"{stage['name']:<20} {stage['seconds']:8.3f}s {peak:>10}")
+    print(f"{'total':<20} {result['total_seconds']:8.3f}s")
+    print(", ".join(f"{name}={value}" for name, value in counts.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("params") != params:
+            print("Note: the runs used different parameters.")
+        regressions = compare(result, previous, args.tolerance)
+        if regressions:
+            sys.exit(f"Slower than {args.compare}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
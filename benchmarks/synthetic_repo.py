@@ -0,0 +1,69 @@
+import os
+import random
+
+
+def package_parts(file_index: int, package_depth: int = 1):
+    """
+    Package directories of the `file_index`th generated file, outermost first.
+    """
+    parts = [f"pkg_{file_index % 10}"]
+    for level in range(1, package_depth):
+        parts.append(f"sub_{(file_index // 10**level) % 10}")
+    return parts
+
+
+def generate_repo(
+    root: str,
+    num_files: int = 200,
+    functions_per_file: int = 20,
+    seed: int = 0,
+    fan_out: int = 3,
+    nesting_depth: int = 0,
+    package_depth: int = 1,
+    cross_module: float = 0.0,
+):
+    """
+    Write a deterministic synthetic Python package under `root`.
+    Every function calls `fan_out` others so extraction has realistic work to
+    do; a `cross_module` share of those calls go to functions of other files
+    through imports. Each function holds a chain of `nesting_depth` nested
+    helpers and files sit `package_depth` directories deep.
+    Returns the list of generated file paths.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for file_index in range(num_files):
+        package = os.path.join(root, *package_parts(file_index, package_depth))
+        os.makedirs(package, exist_ok=True)
+        path = os.path.join(package, f"module_{file_index}.py")
+        imports = ["import os", "import json"]
+        lines = []
+        for func_index in range(functions_per_file):
+            lines.append(f"def func_{file_index}_{func_index}(value):")
+            indent = "    "
+            for level in range(1, nesting_depth + 1):
+                lines.append(f"{indent}def inner_{level}(value):")
+                indent += "    "
+            if nesting_depth:
+                lines.append(f"{indent}return value + 1")
+                for level in range(nesting_depth, 1, -1):
+                    indent = indent[:-4]
+                    lines.append(f"{indent}return inner_{level}(value)")
+                lines.append("    total = inner_1(value)")
+            else:
+                lines.append("    total = value")
+            for _ in range(fan_out):
+                if cross_module and num_files > 1 and rng.random() < cross_module:
+                    other = rng.randrange(num_files)
+                    package_name = ".".join(package_parts(other, package_depth))
+                    imports.append(f"from {package_name} import module_{other}")
+                    callee = f"module_{other}.func_{other}_{rng.randrange(functions_per_file)}"
+                else:
+                    callee = f"func_{file_index}_{rng.randrange(functions_per_file)}"
+                lines.append(f"    total += {callee}(total) if total < 0 else 1")
+            lines.append("    return total")
+            lines.append("")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(list(dict.fromkeys(imports)) + [""] + lines))
+        paths.append(path)
+    return paths
@@ -0,0 +1,159 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from metrics import EXPLANATION_CACHE_REQUESTS, STAGE_SECONDS
+
+MODEL_NAME = "facebook/bart-large-cnn"
+
+DEFAULT_EXPLANATION_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "codeflowmapper",
+    "explanations.sqlite3",
+)
+
+
+class Explainer:
+    """
+    Code explanation model that is only built when it is first needed.
+
+    Loading BART takes seconds and over a gigabyte of memory, so nothing is
+    imported or downloaded until `load` is called, either by the first
+    explanation request or by `warm_in_background` once the server is up.
+    With `quantize`, the model runs on CPU with int8 dynamic quantization of
+    its linear layers, and `num_threads` caps the threads torch may use.
+    """
+
+    def __init__(
+        self, model: str = MODEL_NAME, quantize: bool = False, num_threads: int = None
+    ):
+        self.model = model
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._pipeline is not None
+
+    def load(self):
+        """
+        Build the pipeline if needed and return it. Safe to call from any thread.
+        """
+        if self._pipeline is not None:
+            return self._pipeline
+        with self._lock:
+            if self._pipeline is None:
+                with STAGE_SECONDS.time(stage="explainer_load"):
+                    self._pipeline = self._build()
+        return self._pipeline
+
+    def _build(self):
+        import torch
+        from transformers import pipeline
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if self.quantize:
+            generator = pipeline("text2text-generation", model=self.model, device="cpu")
+            generator.model = torch.quantization.quantize_dynamic(
+                generator.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            return generator
+        return pipeline("text2text-generation", model=self.model)
+
+    def warm_in_background(self):
+        """
+        Start loading the model on a daemon thread and return immediately.
+        """
+        thread = threading.Thread(target=self.load, name="explainer-warmup")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def settings(self):
+        """
+        Everything besides the code that changes what the model produces.
+        """
+        return {"model": self.model, "quantize": self.quantize}
+
+    def explain_batch(self, codes: list):
+        pipeline = self.load()
+        with STAGE_SECONDS.time(stage="explain"):
+            outputs = pipeline(codes, batch_size=len(codes), truncation=True)
+        return [output["summary_text"] for output in outputs]
+
+    def __call__(self, code, **kwargs):
+        return self.load()(code, **kwargs)
+
+
+class ExplanationCache:
+    """
+    Memoizes explanations by a hash of the code and the model settings.
+
+    Recent explanations are kept in an in-memory LRU of `max_entries`, and
+    optionally in a SQLite file at `disk_path` that survives restarts.
+    """
+
+    def __init__(self, settings: dict, max_entries=1024, disk_path=None):
+        self._settings = json.dumps(settings, sort_keys=True)
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._disk = None
+        if disk_path:
+            if os.path.dirname(disk_path):
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS explanations "
+                "(key TEXT PRIMARY KEY, explanation TEXT NOT NULL)"
+            )
+            self._disk.commit()
+
+    def key(self, code: str):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self._settings.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, key, explanation):
+        self._memory[key] = explanation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, key):
+        """
+        Return a stored explanation without running the model, or None.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                EXPLANATION_CACHE_REQUESTS.inc(result="memory")
+                return self._memory[key]
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT explanation FROM explanations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    EXPLANATION_CACHE_REQUESTS.inc(result="disk")
+                    return row[0]
+        EXPLANATION_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def store(self, key, explanation):
+        with self._lock:
+            self._remember(key, explanation)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO explanations VALUES (?, ?)",
+                    (key, explanation),
+                )
+                self._disk.commit()
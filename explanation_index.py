@@ -0,0 +1,65 @@
+import math
+from inference_worker import BACKGROUND
+
+
+def node_explanation(node, source_index, cache):
+    """
+    Stored explanation for a node, without running the model.
+    """
+    source = source_index.source(node)
+    if source is None:
+        return None
+    return cache.lookup(cache.key(source))
+
+
+def precompute_explanations(
+    G, functions: dict, source_index, cache, worker, batch_size=8, progress=None
+):
+    """
+    Generate explanations for every function node of the graph store G, most
+    connected first.
+
+    Entries are keyed by a hash of the function source, so functions that
+    are already stored, by an interrupted earlier run or because their code
+    did not change, are skipped. Batches are queued on the inference worker
+    behind interactive requests, which stores each result as it is done.
+    Returns the number of generated and skipped functions; functions whose
+    explanation failed count as skipped.
+    """
+    nodes = [node for node in G.nodes if node in functions]
+    nodes.sort(key=lambda node: G.degree(G.ids[node]), reverse=True)
+
+    generated = 0
+    skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal generated, skipped
+        jobs = [
+            worker.submit(source, timeout=math.inf, priority=BACKGROUND)[0]
+            for source in batch
+        ]
+        for job in jobs:
+            job.wait()
+            if job.status == "done":
+                generated += 1
+            else:
+                skipped += 1
+        batch.clear()
+        if progress is not None:
+            progress(generated, skipped, len(nodes))
+
+    for node in nodes:
+        source = source_index.source(node)
+        if source is None:
+            skipped += 1
+            continue
+        if cache.lookup(cache.key(source)) is not None:
+            skipped += 1
+            continue
+        batch.append(source)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return generated, skipped
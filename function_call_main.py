@@ -1,8 +1,14 @@
 import os
-import ast
+import argparse
 import flask
+import metrics
 import networkx as nx
 from flask import Flask, render_template_string, jsonify
+from indexer import timed_index
+from layout import force_layout
+from metrics import timed
+from parse_cache import DEFAULT_CACHE_PATH, ParseCache
+from symbols import SymbolTable
 
 app = Flask(__name__)
 
@@ -10,9 +16,13 @@ G = None
 
 
 def network_to_visjs(G):
-    nodes = [
-        {"id": node, "label": G.nodes[node].get("label", node)} for node in G.nodes()
-    ]
+    nodes = []
+    for node, data in G.nodes(data=True):
+        visjs_node = {"id": node, "label": data.get("label", node)}
+        if "x" in data:
+            visjs_node["x"] = data["x"]
+            visjs_node["y"] = data["y"]
+        nodes.append(visjs_node)
     edges = [{"from": source, "to": target} for source, target in G.edges()]
     return {"nodes": nodes, "edges": edges}
 
@@ -28,77 +38,43 @@ def parse_directory(directory_path: str, omit_dirs: list):
     return python_files
 
 
-def parse_file(file_path: str):
-    with open(file_path, "r", encoding="utf-8") as f:
-        tree = ast.parse(f.read())
-    return tree
-
-
-def extract_functions_and_imports(tree):
-    functions = {}
-    imports = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            functions[node.name] = {"calls": [], "line": node.lineno, "file": None}
-        elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-            for alias in node.names:
-                imports.add(alias.name.split(".")[0])  # Add imported module names
-    return functions, imports
-
-
-def analyze_function_calls(tree, functions):
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Call):
-            caller = None
-            for parent in ast.walk(tree):
-                if isinstance(parent, ast.FunctionDef) and node in ast.walk(parent):
-                    caller = parent.name
-                    break
-            if caller and caller in functions:
-                if isinstance(node.func, ast.Name):
-                    called_func = node.func.id
-                    functions[caller]["calls"].append(called_func)
-                elif isinstance(node.func, ast.Attribute):
-                    called_func = node.func.attr
-                    if isinstance(node.func.value, ast.Name):
-                        object_name = node.func.value.id
-                        functions[caller]["calls"].append(
-                            f"{object_name}.{called_func}"
-                        )
-                    else:
-                        functions[caller]["calls"].append(called_func)
-                else:
-                    if hasattr(node.func, "id"):
-                        functions[caller]["calls"].append(node.func.id)
-                    elif hasattr(node.func, "attr"):
-                        functions[caller]["calls"].append(node.func.attr)
-
-
-def create_graph_with_directory_structure(functions, imports, file_paths):
-    G = nx.DiGraph()
+def add_file_to_graph(G, file_path, file_functions, functions):
+    """
+    Insert one file, its directory and its functions and call edges into G.
+    """
+    directory = os.path.dirname(file_path)
+    module_name = os.path.basename(file_path).replace(".py", "")
 
-    directory_nodes = {}
+    # Add directory node
+    if directory not in G:
+        G.add_node(directory, label=directory, shape="box", color="lightblue")
 
-    for file_path in file_paths:
-        directory = os.path.dirname(file_path)
-        module_name = os.path.basename(file_path).replace(".py", "")
+    # Add file node
+    G.add_node(file_path, label=module_name, shape="ellipse", color="lightgreen")
+    G.add_edge(directory, file_path)
 
-        # Add directory node
-        if directory not in directory_nodes:
-            G.add_node(directory, label=directory, shape="box", color="lightblue")
-            directory_nodes[directory] = True
+    for func in file_functions:
+        G.add_node(func, label=functions[func]["name"], module=module_name)
+        G.add_edge(file_path, func)
+        for call in functions[func]["calls"]:
+            if call in functions:
+                G.add_edge(func, call)
 
-        # Add file node
-        G.add_node(file_path, label=module_name, shape="ellipse", color="lightgreen")
-        G.add_edge(directory, file_path)
 
-        for func, data in functions.items():
-            if data["file"] == file_path:
-                G.add_node(func, module=module_name)
-                G.add_edge(file_path, func)
-                for call in data["calls"]:
-                    if call in functions:
-                        G.add_edge(func, call)
+def create_graph_with_directory_structure(
+    functions, imports, file_paths, progress=None
+):
+    G = nx.DiGraph()
+
+    # Bucket functions by file once instead of scanning all of them per file.
+    functions_by_file = {}
+    for func, data in functions.items():
+        functions_by_file.setdefault(data["file"], []).append(func)
+
+    for i, file_path in enumerate(file_paths):
+        add_file_to_graph(G, file_path, functions_by_file.get(file_path, []), functions)
+        if progress is not None:
+            progress(i, file_path)
 
     for module in imports:
         G.add_node(module, module="import")
@@ -106,6 +82,20 @@ def create_graph_with_directory_structure(functions, imports, file_paths):
     return G
 
 
+def add_layout(G):
+    """
+    Store precomputed x/y positions on every node of G.
+    """
+    nodes = list(G.nodes())
+    ids = {node: i for i, node in enumerate(nodes)}
+    sources = [ids[source] for source, _ in G.edges()]
+    targets = [ids[target] for _, target in G.edges()]
+    x, y = force_layout(len(nodes), sources, targets)
+    for i, node in enumerate(nodes):
+        G.nodes[node]["x"] = round(float(x[i]), 1)
+        G.nodes[node]["y"] = round(float(y[i]), 1)
+
+
 @app.route("/")
 def index():
     return render_template_string(
@@ -165,6 +155,8 @@ def index():
 
                         }
                     };
+                    // Positions computed on the server are drawn as they are
+                    options.physics.enabled = !(data.nodes.length && 'x' in data.nodes[0]);
                     var network = new vis.Network(container, data, options);
                 });
         </script>
@@ -176,7 +168,16 @@ def index():
 
 @app.route("/graph_data")
 def graph_data():
-    return jsonify(network_to_visjs(G))
+    return jsonify(timed("serialize", lambda: network_to_visjs(G)))
+
+
+def collect_metrics():
+    if G is not None:
+        metrics.GRAPH_SIZE.set(G.number_of_nodes(), repo="", element="nodes")
+        metrics.GRAPH_SIZE.set(G.number_of_edges(), repo="", element="edges")
+
+
+metrics.instrument(app, collect_metrics)
 
 
 def run_flask_app():
@@ -187,41 +188,68 @@ def run_flask_app():
     app.run(debug=True)
 
 
-def create_graph_from_directory(directory_path, omit_dirs):
+def create_graph_from_directory(directory_path, omit_dirs, cache=None, layout=True):
     global G
-    python_files = parse_directory(directory_path, omit_dirs)
+    python_files = timed("discover", lambda: parse_directory(directory_path, omit_dirs))
+    summaries, _ = timed_index(python_files, cache=cache)
 
-    functions = {}
-    imports = set()
-
-    for i, file_path in enumerate(python_files):
-        tree = parse_file(file_path)
-        file_functions, file_imports = extract_functions_and_imports(tree)
-
-        for func_name, func_data in file_functions.items():
-            func_data["file"] = file_path
-
-        functions.update(file_functions)
-        imports.update(file_imports)
-        analyze_function_calls(tree, functions)
-
-        G = create_graph_with_directory_structure(
-            functions, imports, python_files[: i + 1]
-        )
+    # Functions keyed by qualified name, with calls resolved to qualified names
+    symbols = timed("resolve", lambda: SymbolTable(summaries, directory_path))
+    functions, imports = symbols.functions, symbols.imports
 
+    def report_progress(i, file_path):
         print(
             f"Processing file {i+1}/{len(python_files)}: {os.path.basename(file_path)}"
         )
 
+    G = timed(
+        "graph_build",
+        lambda: create_graph_with_directory_structure(
+            functions, imports, python_files, progress=report_progress
+        ),
+    )
+
+    if layout:
+        timed("layout", lambda: add_layout(G))
+
+    if cache is not None:
+        print(cache.report())
     print("Graph creation completed.")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Visualize function calls.")
+    parser.add_argument(
+        "--cache-path",
+        default=DEFAULT_CACHE_PATH,
+        help="Location of the persistent parse cache.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-parse every file instead of reusing cached results.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["server", "browser"],
+        default="server",
+        help="Compute node positions once on the server (default), or let the "
+        "browser lay the graph out with its physics simulation.",
+    )
+    args = parser.parse_args()
+
     directory_path = input("Enter the path to the directory: ")
     print(f"The input directory is: {directory_path}")
     omit_dirs = input("Enter the directories to omit (comma-separated): ").split(",")
     omit_list = [func.strip() for func in omit_dirs]
-    create_graph_from_directory(directory_path, omit_list)
+    cache = None
+    if not args.no_cache:
+        cache = ParseCache(args.cache_path, namespace="function_call_main")
+    create_graph_from_directory(
+        directory_path, omit_list, cache, layout=args.layout == "server"
+    )
+    if cache is not None:
+        cache.close()
     run_flask_app()
 
 
@@ -0,0 +1,268 @@
+import os
+import json
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from indexer import default_jobs, summarize_source
+from parse_cache import content_hash
+from symbols import SymbolTable
+
+SNAPSHOT_FORMAT = "codeflowmapper-summaries"
+SNAPSHOT_VERSION = 2
+
+
+def git(repo: str, *args: str):
+    """
+    Run a local git command in `repo` and return its output.
+    """
+    result = subprocess.run(["git", "-C", repo, *args], check=True, capture_output=True)
+    return result.stdout
+
+
+def resolve_commit(repo: str, rev: str):
+    return git(repo, "rev-parse", "--verify", f"{rev}^{{commit}}").decode().strip()
+
+
+def _omitted(path: str, omit_dirs: list):
+    return any(part in omit_dirs for part in path.split("/")[:-1])
+
+
+def tracked_files(repo: str, commit: str, omit_dirs: list = ()):
+    """
+    Python files of a commit, relative to `repo` (which may be a subdirectory).
+    """
+    output = git(repo, "ls-tree", "-r", "-z", "--name-only", "--full-name", commit)
+    prefix = git(repo, "rev-parse", "--show-prefix").decode().strip()
+    paths = []
+    for path in output.decode().split("\0"):
+        if path.endswith(".py") and path.startswith(prefix):
+            path = path[len(prefix) :]
+            if not _omitted(path, omit_dirs):
+                paths.append(path)
+    return paths
+
+
+def changed_files(repo: str, base: str, head: str, omit_dirs: list = ()):
+    """
+    Python files changed between two commits as (changed, deleted) paths
+    relative to `repo`. Renames count as a deletion and an addition.
+    """
+    output = git(
+        repo,
+        "diff",
+        "--name-status",
+        "-z",
+        "--no-renames",
+        "--relative",
+        base,
+        head,
+        "--",
+        "*.py",
+    )
+    fields = output.decode().split("\0")
+    changed, deleted = [], []
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if not path.endswith(".py") or _omitted(path, omit_dirs):
+            continue
+        (deleted if status == "D" else changed).append(path)
+    return changed, deleted
+
+
+def read_blobs(repo: str, commit: str, paths: list):
+    """
+    Content of files at a commit, read in one `git cat-file --batch` call.
+    """
+    if not paths:
+        return {}
+    prefix = git(repo, "rev-parse", "--show-prefix").decode().strip()
+    requests = "".join(f"{commit}:{prefix}{path}\n" for path in paths).encode()
+    output = subprocess.run(
+        ["git", "-C", repo, "cat-file", "--batch"],
+        input=requests,
+        check=True,
+        capture_output=True,
+    ).stdout
+    blobs = {}
+    position = 0
+    for path in paths:
+        end = output.index(b"\n", position)
+        header = output[position:end].split()
+        position = end + 1
+        if header[-1] == b"missing":
+            continue
+        size = int(header[2])
+        blobs[path] = output[position : position + size]
+        position += size + 1
+    return blobs
+
+
+def _summarize_blob(task):
+    file_path, data = task
+    try:
+        summary = summarize_source(file_path, data)
+    except (SyntaxError, ValueError):
+        return None
+    summary["hash"] = content_hash(data)
+    return summary
+
+
+def summarize_blobs(repo: str, commit: str, paths: list, jobs: int = 1):
+    """
+    Summaries of files as they are at `commit`, keyed by their path under
+    `repo`. Files that do not parse are left out.
+    """
+    blobs = read_blobs(repo, commit, paths)
+    tasks = [(os.path.join(repo, path), data) for path, data in blobs.items()]
+    if jobs <= 1 or len(tasks) < 2:
+        results = list(map(_summarize_blob, tasks))
+    else:
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_summarize_blob, tasks, chunksize=chunksize))
+    return {task[0]: summary for task, summary in zip(tasks, results) if summary}
+
+
+def save_snapshot(path: str, snapshot: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+
+
+def load_snapshot(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if (
+        snapshot.get("format") != SNAPSHOT_FORMAT
+        or snapshot.get("version") != SNAPSHOT_VERSION
+    ):
+        raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} snapshot")
+    return snapshot
+
+
+def build_snapshot(repo: str, rev: str, omit_dirs: list = (), jobs: int = 1):
+    """
+    Summarize every Python file of a commit. The repository is stored as an
+    absolute path, so the snapshot can be updated from any directory.
+    """
+    repo = os.path.abspath(repo)
+    commit = resolve_commit(repo, rev)
+    paths = tracked_files(repo, commit, omit_dirs)
+    summaries = summarize_blobs(repo, commit, paths, jobs)
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "root": repo,
+        "commit": commit,
+        "omit_dirs": list(omit_dirs),
+        "summaries": [summaries[path] for path in sorted(summaries)],
+    }
+
+
+def update_snapshot(snapshot: dict, rev: str, base: str = None, jobs: int = 1):
+    """
+    Snapshot of `rev` derived from a snapshot of `base` (by default the commit
+    the snapshot was built from), re-summarizing only the files git reports
+    as changed. Returns the new snapshot and the changed and deleted paths.
+    """
+    repo = snapshot["root"]
+    base = resolve_commit(repo, base or snapshot["commit"])
+    if base != snapshot["commit"]:
+        raise ValueError(
+            f"The snapshot was built from {snapshot['commit']}, not {base}"
+        )
+    commit = resolve_commit(repo, rev)
+    changed, deleted = changed_files(repo, base, commit, snapshot["omit_dirs"])
+    summaries = {summary["path"]: summary for summary in snapshot["summaries"]}
+    for path in changed + deleted:
+        summaries.pop(os.path.join(repo, path), None)
+    summaries.update(summarize_blobs(repo, commit, changed, jobs))
+    updated = dict(
+        snapshot,
+        commit=commit,
+        summaries=[summaries[path] for path in sorted(summaries)],
+    )
+    return updated, changed, deleted
+
+
+def call_edges(functions: dict):
+    return {
+        (caller, callee)
+        for caller, data in functions.items()
+        for callee in data["calls"]
+        if callee in functions
+    }
+
+
+def structural_diff(old: dict, new: dict):
+    """
+    Functions and call edges added or removed between two snapshots.
+    """
+    old_functions = SymbolTable(old["summaries"], old["root"]).functions
+    new_functions = SymbolTable(new["summaries"], new["root"]).functions
+    old_edges, new_edges = call_edges(old_functions), call_edges(new_functions)
+    return {
+        "base": old["commit"],
+        "head": new["commit"],
+        "added_functions": sorted(new_functions.keys() - old_functions.keys()),
+        "removed_functions": sorted(old_functions.keys() - new_functions.keys()),
+        "added_calls": sorted(new_edges - old_edges),
+        "removed_calls": sorted(old_edges - new_edges),
+    }
+
+
+def format_diff(diff: dict):
+    lines = [f"{diff['base'][:12]}..{diff['head'][:12]}"]
+    lines += [f"+ {name}" for name in diff["added_functions"]]
+    lines += [f"- {name}" for name in diff["removed_functions"]]
+    lines += [f"+ {caller} -> {callee}" for caller, callee in diff["added_calls"]]
+    lines += [f"- {caller} -> {callee}" for caller, callee in diff["removed_calls"]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Index a git repository from its commits instead of the "
+        "working tree. 'build' summarizes every file of a commit, 'update' "
+        "derives the snapshot of a later commit from an earlier one by only "
+        "parsing the files changed in between. Pass a snapshot to "
+        "'main.py build --summaries' to turn it into a graph to serve."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Summarize every file of a commit.")
+    build.add_argument("repo", help="Repository, or a directory inside it.")
+    build.add_argument("--rev", default="HEAD")
+    build.add_argument("--omit", nargs="*", default=[], help="Directories to omit.")
+    build.add_argument("--output", required=True, help="Snapshot file to write.")
+    build.add_argument("--jobs", type=int, default=default_jobs())
+
+    update = subparsers.add_parser(
+        "update", help="Apply the changes of a commit range to a snapshot."
+    )
+    update.add_argument("snapshot", help="Snapshot of the base commit.")
+    update.add_argument(
+        "--range",
+        default="HEAD",
+        help="BASE..HEAD, or just HEAD to start from the snapshot's commit.",
+    )
+    update.add_argument("--output", required=True, help="Snapshot file to write.")
+    update.add_argument("--diff", help="Also write the structural diff as JSON.")
+    update.add_argument("--jobs", type=int, default=default_jobs())
+    args = parser.parse_args()
+
+    if args.command == "build":
+        snapshot = build_snapshot(
+            os.path.normpath(args.repo), args.rev, args.omit, args.jobs
+        )
+        save_snapshot(args.output, snapshot)
+        print(f"Indexed {len(snapshot['summaries'])} files at {snapshot['commit']}")
+    else:
+        base, _, head = args.range.rpartition("..")
+        old = load_snapshot(args.snapshot)
+        new, changed, deleted = update_snapshot(old, head, base or None, args.jobs)
+        save_snapshot(args.output, new)
+        print(f"Parsed {len(changed)} changed files, dropped {len(deleted)}")
+        diff = structural_diff(old, new)
+        if args.diff:
+            with open(args.diff, "w", encoding="utf-8") as f:
+                json.dump(diff, f, indent=2)
+        print(format_diff(diff))
@@ -0,0 +1,130 @@
+from array import array
+from collections import deque
+
+DIRECTIONS = ("callees", "callers", "both")
+
+
+def _csr(num_nodes: int, sources: array, targets: array):
+    """
+    Compressed sparse rows for parallel source/target id arrays: the
+    neighbors of node i are row[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array("l", [0]) * (num_nodes + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(num_nodes):
+        offsets[i + 1] += offsets[i]
+    position = array("l", offsets)
+    row = array("l", [0]) * len(sources)
+    for source, target in zip(sources, targets):
+        row[position[source]] = target
+        position[source] += 1
+    return offsets, row
+
+
+class GraphIndex:
+    """
+    Integer-indexed adjacency of a graph, for answering neighborhood queries
+    without walking NetworkX dicts. `nodes` are the node keys in id order,
+    `sources` and `targets` the endpoint ids of each edge. Adjacency that is
+    already compressed, e.g. loaded from a snapshot, can be passed as `csr`
+    (successor offsets and ids, predecessor offsets and ids) instead.
+    """
+
+    def __init__(
+        self,
+        nodes: list,
+        sources: array,
+        targets: array,
+        ids: dict = None,
+        csr: tuple = None,
+    ):
+        self.nodes = nodes
+        self.ids = {node: i for i, node in enumerate(nodes)} if ids is None else ids
+        if csr is None:
+            self.succ_offsets, self.succ = _csr(len(nodes), sources, targets)
+            self.pred_offsets, self.pred = _csr(len(nodes), targets, sources)
+        else:
+            self.succ_offsets, self.succ, self.pred_offsets, self.pred = csr
+        self.num_edges = len(self.succ)
+
+    @classmethod
+    def from_networkx(cls, G):
+        nodes = list(G.nodes())
+        ids = {node: i for i, node in enumerate(nodes)}
+        sources = array("l", (ids[source] for source, _ in G.edges()))
+        targets = array("l", (ids[target] for _, target in G.edges()))
+        return cls(nodes, sources, targets, ids)
+
+    def edges(self):
+        """
+        All edges as (source id, target id) pairs, grouped by source.
+        """
+        for i in range(len(self.nodes)):
+            for j in self.successors(i):
+                yield i, j
+
+    def successors(self, i: int):
+        return self.succ[self.succ_offsets[i] : self.succ_offsets[i + 1]]
+
+    def predecessors(self, i: int):
+        return self.pred[self.pred_offsets[i] : self.pred_offsets[i + 1]]
+
+    def degree(self, i: int):
+        return (
+            self.succ_offsets[i + 1]
+            - self.succ_offsets[i]
+            + self.pred_offsets[i + 1]
+            - self.pred_offsets[i]
+        )
+
+    def neighborhood(
+        self, node, depth=1, direction="both", max_nodes=500, max_edges=2000
+    ):
+        """
+        Breadth-first k-hop neighborhood of `node` following callees, callers
+        or both. Returns (nodes, edges, truncated), where truncated is True
+        when the node or edge cap cut the result short.
+        """
+        start = self.ids[node]
+        seen = {start: 0}
+        order = [start]
+        queue = deque([start])
+        truncated = False
+
+        while queue:
+            current = queue.popleft()
+            if seen[current] >= depth:
+                continue
+            neighbors = []
+            if direction in ("callees", "both"):
+                neighbors.extend(self.successors(current))
+            if direction in ("callers", "both"):
+                neighbors.extend(self.predecessors(current))
+            for neighbor in neighbors:
+                if neighbor in seen:
+                    continue
+                if len(order) >= max_nodes:
+                    truncated = True
+                    break
+                seen[neighbor] = seen[current] + 1
+                order.append(neighbor)
+                queue.append(neighbor)
+
+        edges = []
+        for source in order:
+            for target in self.successors(source):
+                if target in seen:
+                    if len(edges) >= max_edges:
+                        truncated = True
+                        break
+                    edges.append((self.nodes[source], self.nodes[target]))
+        return [self.nodes[i] for i in order], edges, truncated
+
+    def most_connected(self):
+        """
+        The node with the highest degree, a reasonable place to start exploring.
+        """
+        if not self.nodes:
+            return None
+        return self.nodes[max(range(len(self.nodes)), key=self.degree)]
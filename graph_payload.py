@@ -0,0 +1,57 @@
+import gzip
+import json
+import hashlib
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class GraphPayload:
+    """
+    One serialized graph, with pre-compressed bodies and strong ETags.
+    """
+
+    def __init__(self, data: dict):
+        self.body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.bodies = {"identity": self.body, "gzip": gzip.compress(self.body, 6)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(self.body, quality=5)
+        # Strong validators must differ between encodings of the same data.
+        self.etags = {
+            encoding: (
+                f'"{digest}-{encoding}"' if encoding != "identity" else f'"{digest}"'
+            )
+            for encoding in self.bodies
+        }
+
+    def choose_encoding(self, accept_encoding):
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and accept_encoding.quality(encoding) > 0:
+                return encoding
+        return "identity"
+
+    def response(self, request):
+        """
+        Build the response for a request, answering 304 when the client's copy
+        is current and the smallest encoding it accepts otherwise.
+        """
+        encoding = self.choose_encoding(request.accept_encodings)
+        etag = self.etags[encoding]
+        if_none_match = request.headers.get("If-None-Match", "")
+        matched = any(
+            candidate.strip() in (etag, "*") for candidate in if_none_match.split(",")
+        )
+        if matched:
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        return response
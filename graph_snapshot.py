@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from graph_store import GraphStore, StringTable
+
+# A snapshot is MAGIC, the format version, the length of a JSON header and
+# then 8-byte aligned columns. The header lists each column's type code,
+# offset and length, so loading only maps the file and slices it.
+MAGIC = b"CFMGRAPH"
+SNAPSHOT_VERSION = 1
+_PREFIX = struct.Struct("<8sIQ")
+_ALIGN = 8
+
+
+class StringColumn:
+    """
+    Strings stored as one UTF-8 blob and the offset at which each one starts.
+    Strings are decoded when accessed.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def encode(strings: list):
+        blob = bytearray()
+        offsets = array("q", [0])
+        for string in strings:
+            blob += string.encode("utf-8")
+            offsets.append(len(blob))
+        return array("B", blob), offsets
+
+    def raw(self, i: int):
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        return self.raw(i).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SortedLookup:
+    """
+    Read-only mapping from the strings of a column to their position, found by
+    binary search over `order`, the positions sorted by UTF-8 bytes. Without
+    `order` the column itself is sorted.
+    """
+
+    def __init__(self, column: StringColumn, order=None):
+        self.column = column
+        self.order = order
+
+    def _position(self, key):
+        if not isinstance(key, str):
+            return None
+        target = key.encode("utf-8")
+        low, high = 0, len(self.column)
+        while low < high:
+            middle = (low + high) // 2
+            i = middle if self.order is None else self.order[middle]
+            value = self.column.raw(i)
+            if value == target:
+                return i
+            if value < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get(self, key, default=None):
+        i = self._position(key)
+        return default if i is None else i
+
+    def __getitem__(self, key):
+        i = self._position(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __len__(self):
+        return len(self.column)
+
+    def __iter__(self):
+        return iter(self.column)
+
+
+class SnapshotSpans:
+    """
+    The source spans of a snapshot as a read-only mapping, for SourceIndex.
+    """
+
+    def __init__(self, keys: SortedLookup, files, starts, ends, paths):
+        self.keys = keys
+        self.files = files
+        self.starts = starts
+        self.ends = ends
+        self.paths = paths
+
+    def __contains__(self, node):
+        return node in self.keys
+
+    def __getitem__(self, node):
+        i = self.keys[node]
+        end = self.ends[i]
+        return self.paths[self.files[i]], self.starts[i], None if end < 0 else end
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def save_snapshot(path: str, G: GraphStore, spans: dict, metadata: dict = None):
+    """
+    Write a graph store and the source spans of its nodes to `path`.
+    The file is written next to `path` and renamed, so a server never maps
+    a half-written snapshot.
+    """
+    columns = {}
+    columns["node_blob"], columns["node_offsets"] = StringColumn.encode(G.nodes)
+    order = sorted(range(len(G.nodes)), key=lambda i: G.nodes[i].encode("utf-8"))
+    columns["node_order"] = array("q", order)
+    columns["label_blob"], columns["label_offsets"] = StringColumn.encode(
+        G.strings.strings
+    )
+    columns["succ_offsets"] = array("q", G.succ_offsets)
+    columns["succ"] = array("q", G.succ)
+    columns["pred_offsets"] = array("q", G.pred_offsets)
+    columns["pred"] = array("q", G.pred)
+    columns["labels"] = array("q", G.labels)
+    columns["kinds"] = array("B", G.kinds)
+    columns["styles"] = array("H", G.styles)
+    columns["sizes"] = array("H", G.sizes)
+    columns["file_ids"] = array("q", G.file_ids)
+    if G.groups is not None:
+        columns["groups"] = array("q", G.groups)
+    if G.weights is not None:
+        columns["weights"] = array("d", G.weights)
+    if G.x is not None:
+        columns["x"] = array("f", G.x)
+        columns["y"] = array("f", G.y)
+
+    paths = StringTable()
+    span_keys = sorted(spans, key=lambda key: key.encode("utf-8"))
+    columns["span_blob"], columns["span_offsets"] = StringColumn.encode(span_keys)
+    columns["span_files"] = array("q")
+    columns["span_starts"] = array("q")
+    columns["span_ends"] = array("q")
+    for key in span_keys:
+        file_path, start, end = spans[key]
+        columns["span_files"].append(paths.intern(file_path))
+        columns["span_starts"].append(start)
+        columns["span_ends"].append(-1 if end is None else end)
+    columns["path_blob"], columns["path_offsets"] = StringColumn.encode(paths.strings)
+
+    sections = {}
+    offset = 0
+    for name, column in columns.items():
+        sections[name] = [column.typecode, offset, len(column)]
+        offset += -(-len(column) * column.itemsize // _ALIGN) * _ALIGN
+    header = json.dumps(
+        {
+            "byteorder": sys.byteorder,
+            "metadata": metadata or {},
+            "style_table": G.style_table.strings,
+            "sections": sections,
+        }
+    ).encode("utf-8")
+    data_start = -(-(_PREFIX.size + len(header)) // _ALIGN) * _ALIGN
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - _PREFIX.size - len(header)))
+        for name, column in columns.items():
+            data = column.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % _ALIGN))
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path: str):
+    """
+    Memory-map a snapshot. Returns the graph store, the span mapping for a
+    SourceIndex and the metadata. Nothing is parsed or copied: columns are
+    views of the mapped file and strings are decoded on access.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size = _PREFIX.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a graph snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"{path} is a version {version} snapshot, expected {SNAPSHOT_VERSION}"
+        )
+    header = json.loads(mapped[_PREFIX.size : _PREFIX.size + header_size])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']} machine")
+
+    view = memoryview(mapped)
+    data_start = -(-(_PREFIX.size + header_size) // _ALIGN) * _ALIGN
+    columns = {}
+    for name, (typecode, offset, length) in header["sections"].items():
+        start = data_start + offset
+        itemsize = array(typecode).itemsize
+        columns[name] = view[start : start + length * itemsize].cast(typecode)
+
+    nodes = StringColumn(columns["node_blob"], columns["node_offsets"])
+    style_table = StringTable()
+    for color, shape in header["style_table"]:
+        style_table.intern((color, shape))
+    G = GraphStore(
+        nodes,
+        SortedLookup(nodes, columns["node_order"]),
+        None,
+        None,
+        columns["labels"],
+        columns["kinds"],
+        columns["styles"],
+        columns["sizes"],
+        columns["file_ids"],
+        StringColumn(columns["label_blob"], columns["label_offsets"]),
+        style_table,
+        csr=(
+            columns["succ_offsets"],
+            columns["succ"],
+            columns["pred_offsets"],
+            columns["pred"],
+        ),
+        groups=columns.get("groups"),
+        weights=columns.get("weights"),
+    )
+    if "x" in columns:
+        G.set_layout(columns["x"], columns["y"])
+    spans = SnapshotSpans(
+        SortedLookup(StringColumn(columns["span_blob"], columns["span_offsets"])),
+        columns["span_files"],
+        columns["span_starts"],
+        columns["span_ends"],
+        StringColumn(columns["path_blob"], columns["path_offsets"]),
+    )
+    return G, spans, header["metadata"]
@@ -0,0 +1,402 @@
+import bisect
+from array import array
+
+import networkx as nx
+
+from graph_index import GraphIndex
+
+KINDS = ("other", "directory", "file", "import", "function", "class")
+
+DEFAULT_COLOR = "#FFFFFF"
+DEFAULT_SHAPE = "dot"
+DEFAULT_SIZE = 10
+
+# Kinds sent first when the graph is streamed, lower is earlier
+STREAM_PRIORITY = {"directory": 0, "file": 0, "function": 1}
+
+
+class StringTable:
+    """
+    Interns strings (or other hashable values) so each distinct value is stored
+    once and referenced by id.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, value: str):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def __getitem__(self, string_id: int):
+        return self.strings[string_id]
+
+
+class GraphStore(GraphIndex):
+    """
+    Compact graph with integer node ids, CSR adjacency and array-backed
+    attributes, used instead of a NetworkX DiGraph with a dict per node.
+
+    Node keys are kept once in `nodes`. Labels equal to the key (most
+    functions) cost nothing, other labels and the few distinct colors and
+    shapes are interned. Kind, style, size and containing file are typed
+    arrays indexed by node id. `groups` holds the interned name of the class
+    that encloses each function, -1 elsewhere. `weights`, when given, holds a
+    float per edge in successor order, e.g. measured call counts; vis.js
+    draws weighted edges wider. Build one with GraphStoreBuilder.
+
+    `x` and `y` hold precomputed positions once a layout is set, see
+    set_layout; nodes are then sent with fixed coordinates.
+    """
+
+    def __init__(
+        self,
+        nodes,
+        ids,
+        sources,
+        targets,
+        labels,
+        kinds,
+        styles,
+        sizes,
+        file_ids,
+        strings,
+        style_table,
+        csr=None,
+        groups=None,
+        weights=None,
+    ):
+        super().__init__(nodes, sources, targets, ids, csr)
+        self.labels = labels
+        self.kinds = kinds
+        self.styles = styles
+        self.sizes = sizes
+        self.file_ids = file_ids
+        self.strings = strings
+        self.style_table = style_table
+        self.groups = groups
+        self.weights = weights
+        self.x = None
+        self.y = None
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    def label(self, i: int):
+        label_id = self.labels[i]
+        return self.nodes[i] if label_id < 0 else self.strings[label_id]
+
+    def kind(self, i: int):
+        return KINDS[self.kinds[i]]
+
+    def color(self, i: int):
+        return self.style_table[self.styles[i]][0]
+
+    def shape(self, i: int):
+        return self.style_table[self.styles[i]][1]
+
+    def file(self, i: int):
+        """
+        Key of the file that defines node i, or None.
+        """
+        file_id = self.file_ids[i]
+        return None if file_id < 0 else self.nodes[file_id]
+
+    def group(self, i: int):
+        """
+        Qualified name of the class that defines node i, or None.
+        """
+        if self.groups is None or self.groups[i] < 0:
+            return None
+        return self.strings[self.groups[i]]
+
+    def weight(self, i: int, j: int):
+        """
+        Weight of the edge from node i to node j, 0 when it has none.
+        """
+        if self.weights is None:
+            return 0
+        start, end = self.succ_offsets[i], self.succ_offsets[i + 1]
+        position = bisect.bisect_left(self.succ, j, start, end)
+        if position == end or self.succ[position] != j:
+            return 0
+        return self.weights[position]
+
+    def nodes_of_kind(self, kind: str):
+        """
+        Read-only set view of the nodes of one kind, e.g. every function.
+        """
+        return KindView(self, KINDS.index(kind))
+
+    def to_visjs(self, nodes: list = None, edges: list = None):
+        """
+        vis.js nodes and edges, for the whole graph or for the given node keys
+        and (source, target) key pairs.
+        """
+        if nodes is None:
+            node_ids = range(len(self.nodes))
+        else:
+            node_ids = [self.ids[node] for node in nodes]
+        if edges is None:
+            edges = ((self.nodes[i], self.nodes[j]) for i, j in self.edges())
+        return self._visjs(node_ids, edges)
+
+    def set_layout(self, x, y):
+        """
+        Store node positions, e.g. from layout.layout_graph, as float32 arrays.
+        """
+        self.x = x if isinstance(x, (array, memoryview)) else array("f", x)
+        self.y = y if isinstance(y, (array, memoryview)) else array("f", y)
+
+    def _visjs(self, node_ids, edges):
+        style_table = self.style_table
+        visjs_nodes = []
+        for i in node_ids:
+            color, shape = style_table[self.styles[i]]
+            node = {
+                "id": self.nodes[i],
+                "label": self.label(i),
+                "color": color,
+                "shape": shape,
+                "size": self.sizes[i],
+            }
+            if self.x is not None:
+                node["x"] = round(self.x[i], 1)
+                node["y"] = round(self.y[i], 1)
+            visjs_nodes.append(node)
+        visjs_edges = [
+            {"from": source, "to": target, "color": DEFAULT_COLOR}
+            for source, target in edges
+        ]
+        if self.weights is not None:
+            ids = self.ids
+            for edge in visjs_edges:
+                weight = self.weight(ids[edge["from"]], ids[edge["to"]])
+                if weight:
+                    edge["value"] = weight
+                    edge["title"] = f"{weight:g} call{'s' if weight != 1 else ''}"
+        return {"nodes": visjs_nodes, "edges": visjs_edges}
+
+    def priority_order(self):
+        """
+        Node ids in the order a streamed graph is sent: directories and files,
+        then functions from most to least connected, then everything else.
+        """
+        rank = [STREAM_PRIORITY.get(kind, len(STREAM_PRIORITY)) for kind in KINDS]
+        kinds = self.kinds
+        return array(
+            "l",
+            sorted(
+                range(len(self.nodes)),
+                key=lambda i: (rank[kinds[i]], -self.degree(i)),
+            ),
+        )
+
+    def visjs_chunks(self, order, first_chunk: int = 500, max_chunk: int = 5000):
+        """
+        vis.js nodes in `order`, in chunks that double in size up to
+        `max_chunk`. Each chunk carries the edges between its nodes and the
+        nodes of earlier chunks, so every edge is sent once, after both ends.
+        """
+        position = array("l", [0]) * len(order)
+        for p, i in enumerate(order):
+            position[i] = p
+        nodes = self.nodes
+        start, size = 0, first_chunk
+        while start < len(order):
+            node_ids = order[start : start + size]
+            edges = []
+            for i in node_ids:
+                p = position[i]
+                for j in self.successors(i):
+                    if position[j] <= p:
+                        edges.append((nodes[i], nodes[j]))
+                for j in self.predecessors(i):
+                    if position[j] < p:
+                        edges.append((nodes[j], nodes[i]))
+            yield self._visjs(node_ids, edges)
+            start += size
+            size = min(size * 2, max_chunk)
+
+    def to_networkx(self):
+        """
+        Export as a NetworkX DiGraph with the same node attributes as before.
+        """
+        G = nx.DiGraph()
+        for i, node in enumerate(self.nodes):
+            G.add_node(
+                node,
+                label=self.label(i),
+                color=self.color(i),
+                shape=self.shape(i),
+                size=self.sizes[i],
+                kind=self.kind(i),
+            )
+        for i, j in self.edges():
+            weight = self.weight(i, j)
+            if weight:
+                G.add_edge(self.nodes[i], self.nodes[j], weight=weight)
+            else:
+                G.add_edge(self.nodes[i], self.nodes[j])
+        return G
+
+
+class KindView:
+    """
+    Membership test and iteration over the nodes of one kind of a GraphStore,
+    without materializing a set of keys.
+    """
+
+    def __init__(self, store: GraphStore, kind: int):
+        self.store = store
+        self.kind = kind
+
+    def __contains__(self, node):
+        i = self.store.ids.get(node)
+        return i is not None and self.store.kinds[i] == self.kind
+
+    def __iter__(self):
+        for i, kind in enumerate(self.store.kinds):
+            if kind == self.kind:
+                yield self.store.nodes[i]
+
+
+class GraphStoreBuilder:
+    """
+    Collects nodes and edges with NetworkX-like semantics: adding an existing
+    node updates its attributes, adding an edge creates missing endpoints and
+    duplicate edges are stored once.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.ids = {}
+        self.labels = array("l")
+        self.kinds = array("B")
+        self.styles = array("H")
+        self.sizes = array("H")
+        self.file_ids = array("l")
+        self.groups = array("l")
+        self.strings = StringTable()
+        self.style_table = StringTable()
+        self.edge_codes = array("Q")
+        self.edge_weights = {}
+
+    @classmethod
+    def from_store(cls, G: GraphStore, remove=(), rewire=()):
+        """
+        Builder holding the graph G, built by a GraphStoreBuilder, without the
+        `remove` nodes and their edges and without the out-edges of the
+        `rewire` nodes, so a few changed nodes can be patched in without
+        adding the rest of the graph again. Node attributes are copied as
+        they are and interned strings are shared with G, which is unchanged.
+        """
+        builder = cls()
+        builder.strings = G.strings
+        builder.style_table = G.style_table
+        keep = array("l", (i for i, node in enumerate(G.nodes) if node not in remove))
+        new_ids = array("l", [-1]) * len(G.nodes)
+        for new_id, i in enumerate(keep):
+            new_ids[i] = new_id
+        builder.nodes = [G.nodes[i] for i in keep]
+        builder.ids = {node: i for i, node in enumerate(builder.nodes)}
+        for name in ("labels", "kinds", "styles", "sizes"):
+            column = getattr(G, name)
+            setattr(builder, name, array(column.typecode, (column[i] for i in keep)))
+        builder.file_ids = array(
+            "l", (-1 if G.file_ids[i] < 0 else new_ids[G.file_ids[i]] for i in keep)
+        )
+        if G.groups is not None:
+            builder.groups = array("l", (G.groups[i] for i in keep))
+        else:
+            builder.groups = array("l", [-1]) * len(keep)
+
+        rewired = {G.ids[node] for node in rewire if node in G.ids}
+        for i in keep:
+            if i in rewired:
+                continue
+            source = new_ids[i] << 32
+            for position in range(G.succ_offsets[i], G.succ_offsets[i + 1]):
+                target = new_ids[G.succ[position]]
+                if target < 0:
+                    continue
+                builder.edge_codes.append(source | target)
+                if G.weights is not None and G.weights[position]:
+                    builder.edge_weights[source | target] = G.weights[position]
+        return builder
+
+    def _node_id(self, node):
+        i = self.ids.get(node)
+        if i is None:
+            i = self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.labels.append(-1)
+            self.kinds.append(0)
+            self.styles.append(self.style_table.intern((DEFAULT_COLOR, DEFAULT_SHAPE)))
+            self.sizes.append(DEFAULT_SIZE)
+            self.file_ids.append(-1)
+            self.groups.append(-1)
+        return i
+
+    def add_node(
+        self,
+        node,
+        label=None,
+        kind="other",
+        color=DEFAULT_COLOR,
+        shape=DEFAULT_SHAPE,
+        size=DEFAULT_SIZE,
+        file=None,
+        group=None,
+    ):
+        i = self._node_id(node)
+        self.labels[i] = (
+            -1 if label is None or label == node else self.strings.intern(label)
+        )
+        self.kinds[i] = KINDS.index(kind)
+        self.styles[i] = self.style_table.intern((color, shape))
+        self.sizes[i] = size
+        self.file_ids[i] = -1 if file is None else self._node_id(file)
+        self.groups[i] = -1 if group is None else self.strings.intern(group)
+        return i
+
+    def add_edge(self, source, target, weight=0):
+        """
+        Add an edge; weights given for the same edge more than once add up.
+        """
+        code = self._node_id(source) << 32 | self._node_id(target)
+        self.edge_codes.append(code)
+        if weight:
+            self.edge_weights[code] = self.edge_weights.get(code, 0) + weight
+
+    def build(self):
+        codes = sorted(set(self.edge_codes))
+        sources = array("l", [code >> 32 for code in codes])
+        targets = array("l", [code & 0xFFFFFFFF for code in codes])
+        weights = None
+        if self.edge_weights:
+            # Sorted codes are in successor order, see GraphIndex.
+            weights = array("d", [self.edge_weights.get(code, 0) for code in codes])
+        del codes
+        return GraphStore(
+            self.nodes,
+            self.ids,
+            sources,
+            targets,
+            self.labels,
+            self.kinds,
+            self.styles,
+            self.sizes,
+            self.file_ids,
+            self.strings,
+            self.style_table,
+            groups=self.groups,
+            weights=weights,
+        )
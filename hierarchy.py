@@ -0,0 +1,237 @@
+import os
+
+import numpy as np
+
+from graph_store import DEFAULT_COLOR, KINDS
+
+# Style of the clusters that are not nodes of the graph
+CLUSTER_STYLES = {
+    "root": ("#FFD166", "box"),
+    "directory": ("#FFD166", "box"),
+    "class": ("#9B5DE5", "diamond"),
+    "imports": ("#4ECDC4", "box"),
+}
+
+# Collapsed views pick the deepest level with at most this many clusters.
+DEFAULT_MAX_CLUSTERS = 300
+
+
+class Hierarchy:
+    """
+    Directory → file → class → function tree over the nodes of a GraphStore,
+    for drawing a large graph collapsed to a level of detail.
+
+    Every graph node is a leaf or, for files, a cluster of its functions;
+    directories, classes and the imports are extra clusters keyed with a
+    "dir:", "class:" or "imports:" prefix. Items are numbered parents first
+    and kept in NumPy arrays, so a view at any depth, with any clusters
+    expanded, is a few vectorized passes over the items and the call edges.
+    """
+
+    def __init__(self, G):
+        self.G = G
+        self.keys = []
+        self.item_ids = {}
+        self.kinds = []
+        self.labels = []
+        self.nodes = []
+        parents = []
+
+        def add(key, kind, label, parent, node=-1):
+            item = self.item_ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.kinds.append(kind)
+            self.labels.append(label)
+            self.nodes.append(node)
+            parents.append(parent)
+            return item
+
+        kinds = np.frombuffer(G.kinds, dtype=np.uint8)
+        file_ids = np.flatnonzero(kinds == KINDS.index("file")).tolist()
+        directories = [os.path.dirname(G.nodes[i]) for i in file_ids]
+        root_path = os.path.commonpath(directories) if directories else ""
+        root = add("dir:" + root_path, "root", os.path.basename(root_path) or "/", 0)
+
+        def directory(path):
+            if path == root_path or not path.startswith(root_path):
+                return root
+            item = self.item_ids.get("dir:" + path)
+            if item is None:
+                parent = directory(os.path.dirname(path))
+                item = add("dir:" + path, "directory", os.path.basename(path), parent)
+            return item
+
+        def file(i):
+            item = self.item_ids.get(G.nodes[i])
+            if item is None:
+                parent = directory(os.path.dirname(G.nodes[i]))
+                item = add(G.nodes[i], "file", G.label(i), parent, i)
+            return item
+
+        node_item = np.full(len(G.nodes), -1, dtype=np.int64)
+        for i in file_ids:
+            node_item[i] = file(i)
+        for i in np.flatnonzero(kinds != KINDS.index("file")).tolist():
+            kind = KINDS[kinds[i]]
+            if kind == "function":
+                file_id = G.file_ids[i]
+                parent = root if file_id < 0 else file(file_id)
+                group = G.group(i)
+                if group is not None:
+                    key = "class:" + group
+                    if key not in self.item_ids:
+                        add(key, "class", group.rpartition(".")[2], parent)
+                    parent = self.item_ids[key]
+            elif kind == "import":
+                if "imports:" not in self.item_ids:
+                    add("imports:", "imports", "imports", root)
+                parent = self.item_ids["imports:"]
+            else:
+                parent = root
+            node_item[i] = add(G.nodes[i], kind, G.label(i), parent, i)
+
+        self.node_item = node_item
+        self.parents = np.array(parents, dtype=np.int64)
+        self.depths = np.zeros(len(self.keys), dtype=np.int64)
+        for item in range(1, len(self.keys)):
+            self.depths[item] = self.depths[parents[item]] + 1
+        self.levels = [
+            np.flatnonzero(self.depths == depth)
+            for depth in range(int(self.depths.max()) + 1)
+        ]
+        self.has_children = np.bincount(self.parents[1:], minlength=len(self.keys)) > 0
+
+        # Functions below each item, counted bottom-up
+        is_function = np.array([kind == "function" for kind in self.kinds])
+        self.counts = is_function.astype(np.int64)
+        for level in reversed(self.levels[1:]):
+            np.add.at(self.counts, self.parents[level], self.counts[level])
+
+        # Only calls are aggregated, not the file -> function edges.
+        degrees = np.diff(np.asarray(G.succ_offsets, dtype=np.int64))
+        sources = np.repeat(np.arange(len(G.nodes)), degrees)
+        targets = np.asarray(G.succ, dtype=np.int64)
+        function = KINDS.index("function")
+        calls = (kinds[sources] == function) & (kinds[targets] == function)
+        self.call_sources = node_item[sources[calls]]
+        self.call_targets = node_item[targets[calls]]
+
+    def visible_counts(self):
+        """
+        Number of items shown at each depth with nothing expanded.
+        """
+        leaves = ~self.has_children
+        return [
+            int((self.depths == depth).sum() + (leaves & (self.depths < depth)).sum())
+            for depth in range(1, len(self.levels))
+        ]
+
+    def default_depth(self, max_clusters: int = DEFAULT_MAX_CLUSTERS):
+        """
+        The deepest level at which at most `max_clusters` items are shown.
+        """
+        depth = 1
+        for d, count in enumerate(self.visible_counts(), start=1):
+            if count > max_clusters:
+                break
+            depth = d
+        return depth
+
+    def representatives(self, depth: int, expanded=(), revealed=()):
+        """
+        For each item, the item it is drawn as: itself when shown, otherwise
+        its collapsed ancestor. Items above `depth` and the `expanded` keys
+        (with their ancestors) are open, showing their children instead.
+        The ancestors of the `revealed` keys are opened so they are shown.
+        """
+        is_open = self.depths < depth
+        starts = [self.item_ids.get(key) for key in expanded]
+        for key in revealed:
+            item = self.item_ids.get(key)
+            starts.append(int(self.parents[item]) if item else None)
+        for item in starts:
+            while item is not None and not is_open[item]:
+                is_open[item] = True
+                item = int(self.parents[item]) if item else None
+        is_open &= self.has_children
+
+        shown_below = np.zeros(len(self.keys), dtype=bool)
+        rep = np.zeros(len(self.keys), dtype=np.int64)
+        shown_below[0] = is_open[0]
+        for level in self.levels[1:]:
+            parents = self.parents[level]
+            shown_below[level] = shown_below[parents] & is_open[level]
+            rep[level] = np.where(shown_below[parents], level, rep[parents])
+        visible = rep == np.arange(len(self.keys))
+        visible &= ~shown_below
+        return rep, visible
+
+    def view(self, depth: int = None, expanded=(), revealed=()):
+        """
+        vis.js nodes for the items shown at `depth` with the `expanded`
+        clusters open and the `revealed` items shown, and one edge per pair
+        of shown items with calls between them, weighted by the number of
+        calls.
+        """
+        if depth is None:
+            depth = self.default_depth()
+        rep, visible = self.representatives(depth, expanded, revealed)
+        G = self.G
+        items = np.flatnonzero(visible)
+
+        positions = None
+        if G.x is not None:
+            members = rep[self.node_item]
+            number = np.bincount(members, minlength=len(self.keys))
+            number[number == 0] = 1
+            positions = [
+                np.bincount(members, np.asarray(axis, dtype=np.float64), len(number))
+                / number
+                for axis in (G.x, G.y)
+            ]
+
+        nodes = []
+        for item in items.tolist():
+            node = self.nodes[item]
+            if node >= 0:
+                color, shape = G.color(node), G.shape(node)
+                size = G.sizes[node]
+            else:
+                color, shape = CLUSTER_STYLES[self.kinds[item]]
+                size = 15
+            count = int(self.counts[item])
+            cluster = bool(self.has_children[item])
+            data = {
+                "id": self.keys[item],
+                "label": (
+                    f"{self.labels[item]} ({count})" if cluster else self.labels[item]
+                ),
+                "color": color,
+                "shape": shape,
+                "size": int(size + 4 * np.log2(1 + count)) if cluster else size,
+                "kind": self.kinds[item],
+                "cluster": cluster,
+                # Files are clusters and graph nodes, with code to show
+                "node": node >= 0,
+                "count": count,
+            }
+            if positions is not None:
+                data["x"] = round(float(positions[0][item]), 1)
+                data["y"] = round(float(positions[1][item]), 1)
+            nodes.append(data)
+
+        sources, targets = rep[self.call_sources], rep[self.call_targets]
+        between = sources != targets
+        codes = sources[between] * len(self.keys) + targets[between]
+        codes, weights = np.unique(codes, return_counts=True)
+        edges = [
+            {
+                "from": self.keys[code // len(self.keys)],
+                "to": self.keys[code % len(self.keys)],
+                "value": weight,
+                "title": f"{weight} call{'s' if weight > 1 else ''}",
+                "color": DEFAULT_COLOR,
+            }
+            for code, weight in zip(codes.tolist(), weights.tolist())
+        ]
+        return {"depth": depth, "nodes": nodes, "edges": edges}
@@ -0,0 +1,286 @@
+import os
+import ast
+import time
+from concurrent.futures import ProcessPoolExecutor
+from metrics import FILE_SECONDS, FILES_INDEXED, FILES_PER_SECOND, STAGE_SECONDS
+from parse_cache import content_hash
+from source_index import line_offsets, node_span
+from symbols import SymbolTable
+
+
+def dotted_name(node: ast.AST):
+    """
+    "a.b.c" for a chain of attributes on a plain name, None for anything else.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class ScopeVisitor(ast.NodeVisitor):
+    """
+    Single pass over a module that records function definitions, imports and
+    the calls made by each function.
+
+    Every call is attributed to its innermost enclosing function or method,
+    including nested and async functions. Decorators, default values and
+    annotations belong to the enclosing scope, as they do at runtime. Lambdas
+    have no node of their own in the graph, so their calls are credited to
+    the function that defines them.
+
+    Functions and classes are keyed by their qualified name within the
+    module ("Class.method", "outer.inner") and keep their bare "name".
+    Import aliases are recorded as (level, module, name) so relative imports
+    can be resolved once module names are known. Calls to plain names are
+    recorded as is; with `dotted_calls`, calls through attributes are recorded
+    as the full dotted expression ("self.save", "os.path.join").
+
+    When the module's source bytes are given, functions and classes also
+    record the byte span of their source.
+    """
+
+    def __init__(
+        self,
+        source: bytes = None,
+        dotted_calls: bool = False,
+    ):
+        self.dotted_calls = dotted_calls
+        self.source = source
+        self.offsets = None if source is None else line_offsets(source)
+        self.functions = {}
+        self.classes = {}
+        self.imports = set()
+        self.aliases = {}
+        self.star_imports = []
+        self._names = []
+        self._classes = []
+        self._scopes = []
+
+    def _definition(self, node):
+        data = {
+            "name": node.name,
+            "line": node.lineno,
+            "end_line": node.end_lineno,
+            "file": None,
+        }
+        if self.offsets is not None:
+            data["span"] = node_span(node, self.offsets, self.source)
+        return data
+
+    def _qualname(self, name: str):
+        return ".".join(self._names + [name])
+
+    def call_name(self, func: ast.AST):
+        """
+        Name under which a call target is recorded, or None to skip the call.
+        """
+        if isinstance(func, ast.Name):
+            return func.id
+        if self.dotted_calls:
+            return dotted_name(func)
+        return None
+
+    def _visit_scope(self, node: ast.AST, name: str):
+        for field, value in ast.iter_fields(node):
+            if field == "body":
+                continue
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+
+        self._scopes.append(name)
+        if isinstance(node.body, list):
+            for statement in node.body:
+                self.visit(statement)
+        else:
+            self.visit(node.body)
+        self._scopes.pop()
+
+    def visit_FunctionDef(self, node):
+        qualname = self._qualname(node.name)
+        if qualname not in self.functions:
+            self.functions[qualname] = {
+                "calls": [],
+                "class": self._classes[-1] if self._classes else None,
+                **self._definition(node),
+            }
+        # Functions nested in a method do not belong to the class.
+        classes, self._classes = self._classes, []
+        self._names.append(node.name)
+        self._visit_scope(node, qualname)
+        self._names.pop()
+        self._classes = classes
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        qualname = self._qualname(node.name)
+        self.classes.setdefault(qualname, self._definition(node))
+        for child in node.bases + node.keywords + node.decorator_list:
+            self.visit(child)
+        self._names.append(node.name)
+        self._classes.append(qualname)
+        for statement in node.body:
+            self.visit(statement)
+        self._classes.pop()
+        self._names.pop()
+
+    def visit_Lambda(self, node):
+        self._visit_scope(node, self._scopes[-1] if self._scopes else None)
+
+    def visit_Call(self, node):
+        if self._scopes and self._scopes[-1] is not None:
+            called_func = self.call_name(node.func)
+            if called_func is not None:
+                self.functions[self._scopes[-1]]["calls"].append(called_func)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.add(alias.name.split(".")[0])
+            if alias.asname:
+                self.aliases[alias.asname] = [0, alias.name, None]
+            else:
+                top = alias.name.split(".")[0]
+                self.aliases[top] = [0, top, None]
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            self.imports.add(alias.name.split(".")[0])
+            if alias.name == "*":
+                self.star_imports.append([node.level, node.module or ""])
+            else:
+                self.aliases[alias.asname or alias.name] = [
+                    node.level,
+                    node.module or "",
+                    alias.name,
+                ]
+
+
+def summarize_source(file_path: str, source: bytes):
+    """
+    Extract a single parsed Python file into a small picklable summary,
+    so no AST objects cross process boundaries.
+    """
+    return summarize_tree(file_path, ast.parse(source), source)
+
+
+def summarize_tree(file_path: str, tree: ast.AST, source: bytes):
+    """
+    The summary of summarize_source for a file already parsed into `tree`.
+    """
+    visitor = ScopeVisitor(source=source, dotted_calls=True)
+    visitor.visit(tree)
+    return {
+        "path": file_path,
+        "functions": visitor.functions,
+        "classes": visitor.classes,
+        "imports": sorted(visitor.imports),
+        "aliases": visitor.aliases,
+        "star_imports": visitor.star_imports,
+    }
+
+
+def summarize_file(file_path: str, summarize=summarize_source, timings=None):
+    """
+    Read a Python file and summarize it, recording the hash of its content.
+    Seconds spent reading and summarizing are appended to `timings`.
+    """
+    start = time.perf_counter()
+    with open(file_path, "rb") as f:
+        data = f.read()
+    read = time.perf_counter()
+    summary = summarize(file_path, data)
+    summary["hash"] = content_hash(data)
+    if timings is not None:
+        timings += [read - start, time.perf_counter() - read]
+    return summary
+
+
+def _summarize_task(task):
+    timings = []
+    return summarize_file(*task, timings), timings
+
+
+def default_jobs():
+    """
+    Number of worker processes to use when --jobs is not given.
+    """
+    return os.cpu_count() or 1
+
+
+def index_files(
+    python_files: list,
+    jobs: int = 1,
+    summarize=summarize_source,
+    cache=None,
+    timings=None,
+):
+    """
+    Summarize every file, spreading the work across `jobs` worker processes.
+    Files already in `cache` are not parsed again. Summaries are returned in
+    the same order as `python_files` for any `jobs`. The (read, summarize)
+    seconds of each parsed file are recorded as metrics and, when `timings`
+    is a dict, stored in it by path.
+    """
+    summaries = [None] * len(python_files)
+    if cache is not None:
+        for i, file_path in enumerate(python_files):
+            summaries[i] = cache.get(file_path)
+    pending = [i for i, summary in enumerate(summaries) if summary is None]
+    tasks = [(python_files[i], summarize) for i in pending]
+
+    def collect(results):
+        for i, (summary, (read, parse)) in zip(pending, results):
+            summaries[i] = summary
+            FILE_SECONDS.observe(read, phase="read")
+            FILE_SECONDS.observe(parse, phase="parse")
+            if timings is not None:
+                timings[python_files[i]] = (read, parse)
+
+    if jobs <= 1 or len(tasks) < 2:
+        collect(map(_summarize_task, tasks))
+    else:
+        # Small chunks keep workers busy when file sizes vary a lot, large enough
+        # chunks keep the pickling overhead per file low.
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            collect(pool.map(_summarize_task, tasks, chunksize=chunksize))
+
+    if cache is not None:
+        for i in pending:
+            cache.put(python_files[i], summaries[i])
+        cache.flush()
+    FILES_INDEXED.inc(len(python_files))
+    return summaries
+
+
+def timed_index(python_files: list, **options):
+    """
+    index_files, recording the run as the "index" stage and its files per
+    second. Returns the summaries and the seconds it took.
+    """
+    start = time.perf_counter()
+    summaries = index_files(python_files, **options)
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, stage="index")
+    FILES_PER_SECOND.set(len(python_files) / max(elapsed, 1e-9))
+    return summaries, elapsed
+
+
+def merge_summaries(summaries: list, root: str = None):
+    """
+    Merge per-file summaries into the global function and import tables.
+    Functions are keyed by module-qualified name and their calls are resolved
+    to qualified names through a SymbolTable.
+    """
+    symbols = SymbolTable(summaries, root)
+    return symbols.functions, symbols.imports
@@ -0,0 +1,240 @@
+import time
+import uuid
+import queue
+import hashlib
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from metrics import EXPLAIN_QUEUE_SECONDS
+
+# Job priorities, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class ExplanationJob:
+    """
+    One pending or finished explanation, shared by every request for the same code.
+    """
+
+    def __init__(self, key: str, code: str, deadline: float, priority=INTERACTIVE):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.code = code
+        self.deadline = deadline
+        self.priority = priority
+        # Set once the worker takes the job off the queue
+        self.taken = False
+        self.queued_at = time.monotonic()
+        self.status = "queued"
+        self.cached = False
+        self.finished_at = None
+        self.future = Future()
+
+    def finish(self, explanation=None, error=None, cached=False):
+        self.cached = cached
+        self.finished_at = time.monotonic()
+        if error is None:
+            self.status = "done"
+            self.future.set_result(explanation)
+        else:
+            self.status = "failed"
+            self.future.set_exception(error)
+
+    def wait(self, timeout=None):
+        """
+        Block for up to `timeout` seconds; returns True once the job has finished.
+        """
+        try:
+            self.future.exception(timeout=timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def to_dict(self):
+        data = {"job_id": self.id, "status": self.status, "cached": self.cached}
+        if self.status == "done":
+            data["explanation"] = self.future.result()
+        elif self.status == "failed":
+            data["error"] = str(self.future.exception())
+        return data
+
+
+class InferenceWorker:
+    """
+    Runs code explanations on a dedicated thread, grouping queued requests
+    into batches of up to `max_batch_size`, waiting at most `max_wait`
+    seconds for a batch to fill up.
+
+    Interactive jobs are always batched before background ones, such as
+    precomputed explanations, so there is only ever one model call running.
+    At most `max_queue` interactive jobs may be waiting; beyond that `submit`
+    raises `queue.Full` so callers can push back. Jobs still queued after
+    their timeout are failed without running the model. Finished jobs stay
+    available for polling for `result_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        explain_batch,
+        cache=None,
+        max_batch_size=8,
+        max_wait=0.05,
+        max_queue=64,
+        timeout=120.0,
+        result_ttl=300.0,
+    ):
+        self._explain_batch = explain_batch
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.max_queue = max_queue
+        # (priority, order, job); a job raised to interactive is queued twice
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._interactive = 0
+        self._jobs = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="inference-worker", daemon=True
+                )
+                self._thread.start()
+
+    def _key(self, code: str):
+        if self.cache is not None:
+            return self.cache.key(code)
+        return hashlib.blake2b(code.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _put(self, job, priority):
+        if priority == INTERACTIVE:
+            if self._interactive >= self.max_queue:
+                raise queue.Full
+            self._interactive += 1
+        job.priority = min(job.priority, priority)
+        self._queue.put((priority, next(self._order), job))
+
+    def submit(self, code: str, timeout=None, priority=INTERACTIVE):
+        """
+        Queue an explanation and return `(job, cached)`. `cached` is True when
+        no new inference was queued because the result was already known or
+        an identical request is already waiting. An interactive request for
+        code already queued in the background moves it ahead.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        key = self._key(code)
+
+        with self._lock:
+            self._prune()
+            job = self._pending.get(key)
+            if job is not None:
+                if priority < job.priority and not job.taken:
+                    self._put(job, priority)
+                job.deadline = max(job.deadline, deadline)
+                return job, True
+
+            job = ExplanationJob(key, code, deadline, priority)
+            explanation = self.cache.lookup(key) if self.cache is not None else None
+            if explanation is not None:
+                job.finish(explanation, cached=True)
+            else:
+                self._put(job, priority)
+                self._pending[key] = job
+            self._jobs[job.id] = job
+
+        if explanation is None:
+            self._ensure_started()
+        return job, explanation is not None
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _take(self, timeout=None):
+        """
+        Next queued job, or None for an entry of a job already taken.
+        """
+        priority, _, job = self._queue.get(timeout=timeout)
+        with self._lock:
+            if priority == INTERACTIVE:
+                self._interactive -= 1
+            if job.taken:
+                return None
+            job.taken = True
+        return job
+
+    def _next_batch(self):
+        batch = []
+        while not batch:
+            job = self._take()
+            if job is not None:
+                batch.append(job)
+        batch_deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = batch_deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._take(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is not None:
+                batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            now = time.monotonic()
+            runnable = []
+            for job in batch:
+                EXPLAIN_QUEUE_SECONDS.observe(now - job.queued_at)
+                if job.deadline < now:
+                    self._complete(job, error=TimeoutError("explanation timed out"))
+                else:
+                    job.status = "running"
+                    runnable.append(job)
+            if runnable:
+                self._run_batch(runnable)
+
+    def _run_batch(self, jobs):
+        try:
+            explanations = self._explain_batch([job.code for job in jobs])
+        except Exception as exc:
+            if len(jobs) == 1:
+                self._complete(jobs[0], error=exc)
+                return
+            # Run the jobs one by one so only the input that fails gets the error
+            for job in jobs:
+                self._run_batch([job])
+            return
+        for job, explanation in zip(jobs, explanations):
+            if self.cache is not None:
+                self.cache.store(job.key, explanation)
+            self._complete(job, explanation)
+
+    def _complete(self, job, explanation=None, error=None):
+        with self._lock:
+            self._pending.pop(job.key, None)
+        job.finish(explanation, error)
@@ -0,0 +1,151 @@
+import numpy as np
+
+# Distance in vis.js pixels that the ideal edge length is scaled to.
+PIXELS_PER_UNIT = 60
+
+
+def _grid_size(num_nodes: int):
+    """
+    Cells per side of the repulsion grid: about two per node along each axis,
+    as a power of two for the FFT, between 16 and 256.
+    """
+    side = 2 * np.sqrt(num_nodes)
+    return int(min(256, max(16, 2 ** np.ceil(np.log2(side)))))
+
+
+def force_layout(
+    num_nodes: int,
+    sources,
+    targets,
+    iterations: int = 60,
+    initial=None,
+    seed: int = 0,
+    gravity: float = 0.05,
+):
+    """
+    Fruchterman-Reingold positions for a graph given as edge endpoint ids,
+    vectorized with NumPy. Returns x and y as float32 arrays in pixels.
+
+    Repulsion between all pairs is approximated on a grid: the number of
+    nodes per cell is convolved with the 1/d force kernel by FFT, so one
+    iteration costs O(nodes + edges + cells log cells) instead of O(nodes^2).
+    Attraction runs over the edges and a weak gravity keeps disconnected
+    parts together. `initial` positions in pixels, with NaN for new nodes,
+    let a layout continue from an earlier one.
+    """
+    if num_nodes == 0:
+        return np.zeros(0, np.float32), np.zeros(0, np.float32)
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(num_nodes)
+    pos = rng.uniform(0, side, (num_nodes, 2))
+    temperature = side / 10
+    if initial is not None:
+        initial = np.asarray(initial, dtype=np.float64) / PIXELS_PER_UNIT
+        known = ~np.isnan(initial).any(axis=1)
+        if known.any():
+            center = initial[known].mean(axis=0)
+            pos += center - side / 2
+            pos[known] = initial[known]
+            # Nodes that were already placed only need to settle.
+            temperature = side / 50
+
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+
+    cells = _grid_size(num_nodes)
+    padded = 2 * cells
+    offsets = np.fft.fftfreq(padded, 1 / padded)
+    dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+    r2 = dx * dx + dy * dy
+    r2[0, 0] = 1
+    kernel_x = np.fft.rfft2(dx / r2)
+    kernel_y = np.fft.rfft2(dy / r2)
+
+    cooling = temperature / max(iterations, 1)
+    for _ in range(iterations):
+        low = pos.min(axis=0)
+        cell = max((pos.max(axis=0) - low).max(), 1e-9) / (cells - 1)
+        index = np.minimum(((pos - low) / cell).astype(np.int64), cells - 1)
+        flat = index[:, 0] * padded + index[:, 1]
+        density = np.bincount(flat, minlength=padded * padded).reshape(padded, padded)
+        density = np.fft.rfft2(density)
+        force_x = np.fft.irfft2(density * kernel_x, s=(padded, padded))
+        force_y = np.fft.irfft2(density * kernel_y, s=(padded, padded))
+        # The kernel is in cells, a repulsion of k^2 / d with k = 1 in units.
+        disp = np.empty_like(pos)
+        disp[:, 0] = force_x.ravel()[flat] / cell
+        disp[:, 1] = force_y.ravel()[flat] / cell
+
+        delta = pos[targets] - pos[sources]
+        pull = delta * np.sqrt((delta * delta).sum(axis=1))[:, None]
+        for axis in (0, 1):
+            disp[:, axis] += np.bincount(sources, pull[:, axis], num_nodes)
+            disp[:, axis] -= np.bincount(targets, pull[:, axis], num_nodes)
+        disp -= gravity * (pos - pos.mean(axis=0))
+
+        length = np.sqrt((disp * disp).sum(axis=1)) + 1e-9
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature = max(temperature - cooling, 1e-3)
+
+    pos = (pos - pos.mean(axis=0)) * PIXELS_PER_UNIT
+    return pos[:, 0].astype(np.float32), pos[:, 1].astype(np.float32)
+
+
+def layout_graph(G, previous=None, iterations: int = 60):
+    """
+    Positions for the nodes of a GraphIndex. Nodes that were already in the
+    `previous` graph (with a layout) start where they were, so a graph
+    updated in watch mode keeps its shape.
+    """
+    num_nodes = len(G.nodes)
+    degrees = np.diff(np.asarray(G.succ_offsets, dtype=np.int64))
+    sources = np.repeat(np.arange(num_nodes), degrees)
+    targets = np.asarray(G.succ, dtype=np.int64)
+    initial = None
+    if previous is not None and previous.x is not None:
+        initial = np.full((num_nodes, 2), np.nan)
+        for i, node in enumerate(G.nodes):
+            j = previous.ids.get(node)
+            if j is not None:
+                initial[i] = previous.x[j], previous.y[j]
+        # Settling an existing layout takes far fewer steps than a new one.
+        iterations = max(iterations // 4, 10)
+    return force_layout(num_nodes, sources, targets, iterations, initial)
+
+
+def extend_layout(G, previous, seed: int = 0):
+    """
+    Positions for a GraphIndex patched from `previous`, which has a layout:
+    nodes that were already there keep their position, new ones are put
+    next to their placed neighbors, or near the center without any. Nothing
+    is simulated, so this is cheap enough to run on every change.
+    """
+    num_nodes = len(G.nodes)
+    rng = np.random.default_rng(seed)
+    x = np.zeros(num_nodes, np.float32)
+    y = np.zeros(num_nodes, np.float32)
+    placed = np.zeros(num_nodes, bool)
+    new_nodes = []
+    for i, node in enumerate(G.nodes):
+        j = previous.ids.get(node)
+        if j is None:
+            new_nodes.append(i)
+        else:
+            x[i], y[i] = previous.x[j], previous.y[j]
+            placed[i] = True
+    center_x, center_y = (
+        (x[placed].mean(), y[placed].mean()) if placed.any() else (0, 0)
+    )
+    for i in new_nodes:
+        neighbors = [j for j in G.successors(i) if placed[j]]
+        neighbors += [j for j in G.predecessors(i) if placed[j]]
+        if neighbors:
+            x[i], y[i] = x[neighbors].mean(), y[neighbors].mean()
+        else:
+            x[i], y[i] = center_x, center_y
+        x[i] += rng.normal(0, PIXELS_PER_UNIT)
+        y[i] += rng.normal(0, PIXELS_PER_UNIT)
+        placed[i] = True
+    return x, y
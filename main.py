@@ -1,23 +1,52 @@
 import os
-import ast
+import json
+import queue
+import argparse
+import functools
+import threading
 import flask
-import networkx as nx
+import metrics
 from flask import Flask, render_template_string, jsonify, request
-from transformers import pipeline
+from explainer import DEFAULT_EXPLANATION_CACHE_PATH, Explainer, ExplanationCache
+from explanation_index import node_explanation, precompute_explanations
+from inference_worker import InferenceWorker
+from git_index import load_snapshot as load_summaries
+from indexer import default_jobs, index_files, timed_index
+from graph_index import DIRECTIONS
+from graph_store import GraphStore, GraphStoreBuilder
+from graph_payload import GraphPayload
+from graph_snapshot import load_snapshot, save_snapshot
+from hierarchy import Hierarchy
+from layout import extend_layout, layout_graph
+from metrics import timed
+from reachability import ReachabilityEngine
+from repo_registry import RepoRegistry
+from search_index import SearchIndex
+from parse_cache import DEFAULT_CACHE_PATH, ParseCache
+from profiling import profile_slowest
+from source_index import SourceIndex
+from symbols import SymbolTable, qualify
+from tracer import call_counts, call_edges, heat_style, load_trace
+from watcher import make_watcher
+from versioned import VersionedCache, deep_nbytes
 
 app = Flask(__name__)
 
-G = None
-code_contents = {}
+# The code explanation model is loaded on first use, see --explainer-load
+explainer = Explainer()
+explanations = ExplanationCache(explainer.settings())
+inference_worker = InferenceWorker(explainer.explain_batch, explanations)
 
-# Initialize the code explanation model
-explainer = pipeline("text2text-generation", model="facebook/bart-large-cnn")
 
-
-def network_to_visjs(G: nx.DiGraph):
+def network_to_visjs(G, nodes: list = None, edges: list = None):
     """
-    Convert a NetworkX graph to a dictionary format that can be used by vis.js.
+    Convert a GraphStore or NetworkX graph to a dictionary format that can be used by vis.js.
+    Pass `nodes` and `edges` to convert only part of the graph.
     """
+    if isinstance(G, GraphStore):
+        return G.to_visjs(nodes, edges)
+    nodes = G.nodes() if nodes is None else nodes
+    edges = G.edges() if edges is None else edges
     nodes = [
         {
             "id": node,
@@ -26,15 +55,130 @@ def network_to_visjs(G: nx.DiGraph):
             "shape": G.nodes[node].get("shape", "dot"),
             "size": G.nodes[node].get("size", 10),
         }
-        for node in G.nodes()
+        for node in nodes
     ]
     edges = [
-        {"from": source, "to": target, "color": "#FFFFFF"}
-        for source, target in G.edges()
+        {"from": source, "to": target, "color": "#FFFFFF"} for source, target in edges
     ]
     return {"nodes": nodes, "edges": edges}
 
 
+class GraphState:
+    """
+    The graph served for one repository, its functions and source index, and
+    the data derived from it. `version` is bumped whenever the graph changes,
+    so derived data such as the serialized graph is rebuilt.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.G = None
+        self.functions = {}
+        self.source_index = SourceIndex()
+        self.version = 0
+        # Set when --watch keeps the graph in sync with the files, the page
+        # then polls /graph_version to pick up changes.
+        self.watching = False
+        self.snapshot_bytes = 0
+        size = self._derived_nbytes
+        self.payloads = VersionedCache(
+            lambda: timed("serialize", lambda: GraphPayload(network_to_visjs(self.G))),
+            size,
+        )
+        self.stream_orders = VersionedCache(
+            lambda: timed("stream_order", self.G.priority_order), size
+        )
+        self.hierarchies = VersionedCache(
+            lambda: timed("hierarchy", lambda: Hierarchy(self.G)), size
+        )
+        self.search_indexes = VersionedCache(
+            lambda: timed("search_index", lambda: SearchIndex(self.G)), size
+        )
+        self.engines = VersionedCache(
+            lambda: timed(
+                "reachability", lambda: ReachabilityEngine(self.G, self.functions)
+            ),
+            size,
+        )
+
+    @classmethod
+    def from_snapshot(cls, path: str, name: str = None):
+        state = cls(name)
+        G, spans, _ = timed("snapshot_load", lambda: load_snapshot(path))
+        state.install(G, G.nodes_of_kind("function"), SourceIndex(spans))
+        state.snapshot_bytes = os.path.getsize(path)
+        return state
+
+    def install(self, G, functions, source_index):
+        """
+        Swap in a new graph. The version is bumped last so anything derived
+        from the new graph is never cached under the old version.
+        """
+        self.G, self.functions, self.source_index = G, functions, source_index
+        self.version += 1
+
+    def _derived_nbytes(self, value):
+        # Derived data is measured without the graph it keeps a reference to
+        return deep_nbytes(value, shared=[self.G])
+
+    def nbytes(self):
+        """
+        Approximate memory held: the mapped snapshot and the cached data
+        derived from it.
+        """
+        caches = (
+            self.payloads,
+            self.stream_orders,
+            self.hierarchies,
+            self.search_indexes,
+            self.engines,
+        )
+        return self.snapshot_bytes + sum(cache.nbytes() for cache in caches)
+
+    def base_url(self):
+        return "" if self.name is None else f"/repo/{self.name}"
+
+
+# The graph served at the top-level routes
+graph = GraphState()
+
+# Other repositories served under /repo/<name>/, see --repo
+repos = None
+
+# Lay graphs out on the server when they are built, see --layout
+server_layout = True
+
+# Runtime calls merged into the graph when it is built, see --trace
+runtime_trace = None
+
+
+def repo_graph(name: str):
+    if repos is None or name not in repos:
+        flask.abort(404)
+    return repos.get(name)
+
+
+def graph_route(rule: str, **options):
+    """
+    Register a view for the top-level graph at `rule` and for each hosted
+    repository at /repo/<name>`rule`. The view receives the GraphState.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def dispatch(name=None, **kwargs):
+            state = graph if name is None else repo_graph(name)
+            if state.G is None:
+                flask.abort(404)
+            return view(state, **kwargs)
+
+        app.add_url_rule(rule, view_func=dispatch, **options)
+        app.add_url_rule(f"/repo/<name>{rule}", view_func=dispatch, **options)
+        return dispatch
+
+    return decorator
+
+
 def parse_directory(directory_path: str, omit_dirs: list):
     """
     Parse a directory and return a list of Python files in the directory.
@@ -48,78 +192,184 @@ def parse_directory(directory_path: str, omit_dirs: list):
     return python_files
 
 
-def parse_file(file_path: str):
-    """
-    Parse a Python file and return the AST (Abstract Syntax Tree) representation of the code.
-    """
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-        code_contents[file_path] = content
-        tree = ast.parse(content)
-    return tree
+def add_file_node(G, file_path: str):
+    module_name = os.path.basename(file_path).replace(".py", "")
+    G.add_node(
+        file_path, label=module_name, kind="file", color="#FF6B6B", shape="dot", size=15
+    )
 
 
-def extract_functions_and_imports(tree: ast.AST):
-    """
-    Extract function definitions and imports from the AST of a Python file.
-    Also track function calls for execution path visualization.
-    """
-    functions = {}
-    imports = set()
-    function_stack = []
-    current_func = None
+def add_import_node(G, module: str):
+    G.add_node(
+        module, label=module, kind="import", color="#4ECDC4", shape="dot", size=10
+    )
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            current_func = node.name
-            functions[node.name] = {"calls": [], "line": node.lineno, "file": None}
-            function_stack.append(current_func)
 
-        elif isinstance(node, ast.Call) and current_func:
-            if isinstance(node.func, ast.Name):
-                functions[current_func]["calls"].append(node.func.id)
+def add_function_node(G, func_name: str, functions: dict, calls: dict, max_calls):
+    """
+    Add a function, the edge from its file and its call edges. Functions that
+    ran in the runtime trace are sized and colored by their `calls` count.
+    """
+    func_data = functions[func_name]
+    color, size = "#FFFFFF", 7
+    if calls.get(func_name):
+        color, size = heat_style(calls[func_name], max_calls)
+    G.add_node(
+        func_name,
+        label=func_data.get("name", func_name),
+        kind="function",
+        color=color,
+        shape="dot",
+        size=size,
+        file=func_data["file"],
+        group=(
+            qualify(func_data["module"], func_data["class"])
+            if func_data.get("class")
+            else None
+        ),
+    )
+    if func_data["file"]:
+        G.add_edge(func_data["file"], func_name)
 
-        elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-            for alias in node.names:
-                imports.add(alias.name.split(".")[0])
+    for called_func in func_data["calls"]:
+        if called_func in functions:
+            G.add_edge(func_name, called_func)
 
-        elif isinstance(node, ast.Return):
-            if function_stack:
-                function_stack.pop()
-            current_func = function_stack[-1] if function_stack else None
 
-    return functions, imports
+def add_traced_edges(G, functions: dict, trace: dict, callers=None):
+    """
+    Add the calls of a runtime trace as weighted edges, including ones static
+    analysis missed, only for the `callers` functions when given.
+    """
+    for caller, callee, count in call_edges(trace):
+        if callers is not None and caller not in callers:
+            continue
+        if caller in functions and callee in functions:
+            G.add_edge(caller, callee, weight=count)
 
 
 def create_graph_with_directory_structure(
-    functions: dict, imports: set, file_paths: list
+    functions: dict, imports: set, file_paths: list, trace: dict = None
 ):
     """
     Create a directed graph representing the directory structure of Python files, function calls, and imports.
+    The graph is a compact GraphStore, use its to_networkx() where NetworkX is needed.
+    With a runtime `trace` (see tracer.py), traced calls are added as weighted
+    edges, including ones static analysis missed, and called functions are
+    sized and colored by how often they ran.
     """
-    G = nx.DiGraph()
+    G = GraphStoreBuilder()
+    calls = {} if trace is None else call_counts(trace)
+    max_calls = max(calls.values(), default=0)
 
     for file_path in file_paths:
-        module_name = os.path.basename(file_path).replace(".py", "")
-        G.add_node(file_path, label=module_name, color="#FF6B6B", shape="dot", size=15)
+        add_file_node(G, file_path)
 
     for module in imports:
-        G.add_node(module, label=module, color="#4ECDC4", shape="dot", size=10)
+        add_import_node(G, module)
+
+    for func_name in functions:
+        add_function_node(G, func_name, functions, calls, max_calls)
+
+    if trace is not None:
+        add_traced_edges(G, functions, trace)
+
+    return G.build()
+
+
+def install_graph(directory_path: str, summaries: list):
+    """
+    Resolve the file summaries, build the graph and its source index, and
+    swap them in for the ones being served.
+    """
+    symbols = timed("resolve", lambda: SymbolTable(summaries, directory_path))
+    file_paths = [summary["path"] for summary in summaries]
+    with metrics.STAGE_SECONDS.time(stage="source_index"):
+        index = SourceIndex()
+        for file_path in file_paths:
+            index.add_file(file_path)
+        index.add_definitions(symbols.classes)
+        index.add_definitions(symbols.functions)
+    G = timed(
+        "graph_build",
+        lambda: create_graph_with_directory_structure(
+            symbols.functions, symbols.imports, file_paths, runtime_trace
+        ),
+    )
+    if server_layout:
+        G.set_layout(*timed("layout", lambda: layout_graph(G, previous=graph.G)))
+    graph.install(G, symbols.functions, index)
+    graph.search_indexes.get(graph.version)
+    return symbols
 
-    for func_name, func_data in functions.items():
-        G.add_node(func_name, label=func_name, color="#FFFFFF", shape="dot", size=7)
-        if func_data["file"]:
-            G.add_edge(func_data["file"], func_name)
 
-        for called_func in func_data["calls"]:
-            if called_func in functions:
-                G.add_edge(func_name, called_func)
+def patch_graph(symbols, deleted: list, summaries: list):
+    """
+    Apply deleted and re-indexed files to the served graph without rebuilding
+    it: only the calls that may resolve differently are resolved again (see
+    SymbolTable.update), and only the nodes and edges of the changed files
+    and of the functions resolved again are replaced.
+    """
+    imports = set(symbols.imports)
+    removed, resolved, classes = timed(
+        "resolve", lambda: symbols.update(deleted, summaries)
+    )
+    removed |= set(deleted) | (imports - symbols.imports)
+    functions = symbols.functions
+
+    with metrics.STAGE_SECONDS.time(stage="source_index"):
+        index = graph.source_index
+        index.remove(removed)
+        for summary in summaries:
+            index.add_file(summary["path"])
+        index.add_definitions({key: symbols.classes[key] for key in classes})
+        index.add_definitions({key: functions[key] for key in resolved})
 
-    return G
+    def build():
+        G = GraphStoreBuilder.from_store(graph.G, removed, resolved)
+        calls = {} if runtime_trace is None else call_counts(runtime_trace)
+        max_calls = max(calls.values(), default=0)
+        for summary in summaries:
+            add_file_node(G, summary["path"])
+        for module in symbols.imports - imports:
+            add_import_node(G, module)
+        for func_name in resolved:
+            add_function_node(G, func_name, functions, calls, max_calls)
+        if runtime_trace is not None:
+            add_traced_edges(G, functions, runtime_trace, resolved)
+        return G.build()
+
+    G = timed("graph_build", build)
+    if graph.G.x is not None:
+        G.set_layout(*timed("layout", lambda: extend_layout(G, graph.G)))
+    graph.install(G, functions, index)
+    graph.search_indexes.get(graph.version)
+
+
+def watch_directory(symbols, watcher, cache_path=None):
+    """
+    Re-index the files the watcher reports and patch them into the served
+    graph. Only changed files are parsed. A file that does not parse, e.g.
+    in the middle of an edit, keeps its previous summary.
+    """
+    cache = None if cache_path is None else ParseCache(cache_path, namespace="main")
+    while True:
+        added, modified, deleted = watcher.wait()
+        summaries = []
+        for file_path in added + modified:
+            try:
+                summaries.append(index_files([file_path], cache=cache)[0])
+            except (OSError, SyntaxError, ValueError) as e:
+                print(f"Skipping {file_path}: {e}")
+        patch_graph(symbols, deleted, summaries)
+        print(
+            f"Graph version {graph.version}: {len(added)} added, "
+            f"{len(modified)} modified, {len(deleted)} deleted"
+        )
 
 
-@app.route("/")
-def index():
+@graph_route("/")
+def index(state):
     """
     A web page displaying the graph with search and code execution path visualization.
     """
@@ -138,6 +388,10 @@ def index():
                 #code-display, #explanation { padding: 20px; white-space: pre-wrap; font-family: monospace; color: #FFFFFF; }
                 #search-container { position: absolute; top: 20px; left: 20px; z-index: 10; }
                 #search-input { padding: 8px; }
+                #search-results { list-style: none; margin: 0; padding: 0; max-height: 60vh; overflow-y: auto; background-color: #2D2D2D; }
+                #search-results li { padding: 6px 8px; cursor: pointer; }
+                #search-results li:hover { background-color: #3D3D3D; }
+                #search-results small { color: #AAAAAA; display: block; }
                 #explain-button { padding: 8px; background-color: #4CAF50; color: white; border: none; cursor: pointer; }
                 #close-button { position: absolute; top: 10px; right: 10px; padding: 5px 10px; background-color: #f44336; color: white; border: none; cursor: pointer; }
                 .blurred { opacity: 0.3; }
@@ -145,8 +399,9 @@ def index():
         </head>
         <body>
             <div id="search-container">
-                <input type="text" id="search-input" placeholder="Search function...">
+                <input type="text" id="search-input" placeholder="Search functions, classes, files...">
                 <button id="search-button">Search</button>
+                <ul id="search-results"></ul>
             </div>
             <div id="container">
                 <div id="mynetwork"></div>
@@ -158,26 +413,219 @@ def index():
                 </div>
             </div>
             <script>
+                // Prefix of this repository's routes, empty for the top-level graph
+                const BASE = {{ base|tojson }};
                 let network;
                 let highlightActive = false;
                 let selectedNode = null;
 
-                fetch('/graph_data')
+                // Above this many nodes, start from the graph collapsed to clusters
+                // (or from a neighborhood with ?focus=) and expand on demand.
+                const FULL_GRAPH_LIMIT = 5000;
+                const pageParams = new URLSearchParams(window.location.search);
+                const focusParam = pageParams.get('focus');
+                const viewParam = pageParams.get('view');
+
+                function startFocus(info) {
+                    return focusParam || (viewParam === 'neighborhood' ? info.focus : null);
+                }
+
+                function startClusters(info) {
+                    return !startFocus(info) && viewParam !== 'full'
+                        && (viewParam === 'clusters' || info.nodes > FULL_GRAPH_LIMIT);
+                }
+
+                // Depth of the cluster view, chosen by the server on first load,
+                // and the clusters opened since
+                let clusterDepth = null;
+                let expandedClusters = [];
+                let revealedNodes = [];
+
+                function loadClusters() {
+                    const params = new URLSearchParams();
+                    if (clusterDepth !== null) {
+                        params.set('depth', clusterDepth);
+                    }
+                    expandedClusters.forEach(key => params.append('expand', key));
+                    revealedNodes.forEach(key => params.append('reveal', key));
+                    return fetch(`${BASE}/clusters?${params}`)
+                        .then(response => response.json())
+                        .then(graph => {
+                            clusterDepth = graph.depth;
+                            return graph;
+                        });
+                }
+
+                function loadGraph(info) {
+                    const focus = startFocus(info);
+                    if (focus) {
+                        return fetch(`${BASE}/neighborhood?node=${encodeURIComponent(focus)}&depth=2`)
+                            .then(response => response.json());
+                    }
+                    if (startClusters(info)) {
+                        return loadClusters();
+                    }
+                    return fetch(`${BASE}/graph_data`).then(response => response.json());
+                }
+
+                // Parse an NDJSON response line by line, as the chunks arrive
+                function readLines(response, onLine) {
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffered = '';
+                    function pump() {
+                        return reader.read().then(({ done, value }) => {
+                            buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+                            const lines = buffered.split('\\n');
+                            buffered = done ? '' : lines.pop();
+                            lines.filter(line => line).forEach(line => onLine(JSON.parse(line)));
+                            return done ? null : pump();
+                        });
+                    }
+                    return pump();
+                }
+
+                // Fill the network's DataSets: a neighborhood at once, or the whole
+                // graph streamed with files and the most connected functions first
+                function showGraph(info, data) {
+                    if (startFocus(info) || startClusters(info)) {
+                        return loadGraph(info).then(graph => {
+                            data.nodes.add(graph.nodes);
+                            data.edges.add(withEdgeIds(graph.edges));
+                        });
+                    }
+                    return fetch(`${BASE}/graph_stream`).then(response => readLines(response, chunk => {
+                        if (Array.isArray(chunk.nodes)) {
+                            data.nodes.add(chunk.nodes);
+                            data.edges.add(withEdgeIds(chunk.edges));
+                        }
+                    }));
+                }
+
+                // Stable edge ids let expanded neighborhoods merge without duplicates
+                function withEdgeIds(edges) {
+                    return edges.map(edge => Object.assign({ id: `${edge.from}->${edge.to}` }, edge));
+                }
+
+                // Nodes whose neighbors were loaded, reloaded on refresh
+                let expandedNodes = [];
+
+                function expandNode(nodeId) {
+                    expandedNodes.push(nodeId);
+                    fetch(`${BASE}/neighborhood?node=${encodeURIComponent(nodeId)}&depth=1`)
+                        .then(response => response.json())
+                        .then(data => {
+                            network.body.data.nodes.update(data.nodes);
+                            network.body.data.edges.update(withEdgeIds(data.edges));
+                        });
+                }
+
+                // The starting neighborhood and every expanded one, merged
+                function loadNeighborhoods(info) {
+                    const requests = [loadGraph(info)].concat(expandedNodes.map(nodeId =>
+                        fetch(`${BASE}/neighborhood?node=${encodeURIComponent(nodeId)}&depth=1`)
+                            .then(response => response.json())));
+                    return Promise.all(requests).then(graphs => {
+                        const nodes = new Map();
+                        const edges = [];
+                        graphs.forEach(graph => {
+                            // Nodes that are gone since come back as an error
+                            (graph.nodes || []).forEach(node => nodes.set(node.id, node));
+                            edges.push(...(graph.edges || []));
+                        });
+                        return { nodes: Array.from(nodes.values()), edges: edges };
+                    });
+                }
+
+                // Graph version shown on the page, see watchGraph
+                let graphVersion = null;
+
+                // Make the shown graph match `data`, keeping the nodes both have
+                function replaceGraph(data) {
+                    const nodes = network.body.data.nodes;
+                    const edges = network.body.data.edges;
+                    const newEdges = withEdgeIds(data.edges);
+                    const nodeIds = new Set(data.nodes.map(node => node.id));
+                    const edgeIds = new Set(newEdges.map(edge => edge.id));
+                    edges.remove(edges.getIds().filter(id => !edgeIds.has(id)));
+                    nodes.remove(nodes.getIds().filter(id => !nodeIds.has(id)));
+                    nodes.update(data.nodes);
+                    edges.update(newEdges);
+                }
+
+                // Open a cluster: it is replaced by its children
+                function expandCluster(key) {
+                    if (expandedClusters.includes(key)) {
+                        return;
+                    }
+                    expandedClusters.push(key);
+                    loadClusters().then(replaceGraph);
+                }
+
+                // Replace the shown graph with the current one, keeping the view
+                function refreshGraph() {
+                    fetch(`${BASE}/graph_info`)
+                        .then(response => response.json())
+                        .then(info => {
+                            graphVersion = info.version;
+                            return startFocus(info) ? loadNeighborhoods(info) : loadGraph(info);
+                        })
+                        .then(replaceGraph);
+                }
+
+                // In watch mode, poll the version counter and refresh when files change
+                function watchGraph() {
+                    setInterval(function () {
+                        fetch(`${BASE}/graph_version`)
+                            .then(response => response.json())
+                            .then(data => {
+                                if (data.version !== graphVersion) {
+                                    refreshGraph();
+                                }
+                            });
+                    }, 2000);
+                }
+
+                fetch(`${BASE}/graph_info`)
                     .then(response => response.json())
-                    .then(data => {
+                    .then(info => {
+                        graphVersion = info.version;
+                        if (info.watching) {
+                            watchGraph();
+                        }
                         var container = document.getElementById('mynetwork');
                         var options = {
                             nodes: { font: { color: '#FFFFFF' }, size: 12 },
                             edges: { color: '#FFFFFF', smooth: true },
-                            physics: { stabilization: false }
+                            // Graphs laid out on the server are drawn as they are
+                            physics: { enabled: !info.layout, stabilization: false }
                         };
+                        var data = { nodes: new vis.DataSet(), edges: new vis.DataSet() };
                         network = new vis.Network(container, data, options);
+                        showGraph(info, data);
+
+                        // Double click a node to load its neighbors, or a file
+                        // cluster to open it
+                        network.on("doubleClick", function (params) {
+                            if (params.nodes.length > 0) {
+                                const node = network.body.data.nodes.get(params.nodes[0]);
+                                if (node && node.cluster) {
+                                    expandCluster(params.nodes[0]);
+                                } else {
+                                    expandNode(params.nodes[0]);
+                                }
+                            }
+                        });
                         
                         // Search functionality
-                        document.getElementById('search-button').addEventListener('click', performSearch);
+                        let searchTimer = null;
+                        document.getElementById('search-button').addEventListener('click', () => performSearch(0));
                         document.getElementById('search-input').addEventListener('keyup', function(event) {
+                            clearTimeout(searchTimer);
                             if (event.key === 'Enter') {
-                                performSearch();
+                                performSearch(0);
+                            } else {
+                                searchTimer = setTimeout(() => performSearch(0), 200);
                             }
                         });
 
@@ -185,12 +633,19 @@ def index():
                         network.on("click", function (params) {
                             if (params.nodes.length > 0) {
                                 const nodeId = params.nodes[0];
-                                fetch(`/get_code?node=${nodeId}`)
+                                const node = network.body.data.nodes.get(nodeId);
+                                // Directories and classes open on click, files
+                                // show their code like functions
+                                if (node && node.cluster && !node.node) {
+                                    expandCluster(nodeId);
+                                    return;
+                                }
+                                fetch(`${BASE}/get_code?node=${nodeId}`)
                                     .then(response => response.json())
                                     .then(data => {
                                         document.getElementById('code-display').textContent = data.code;
                                         document.getElementById('sidepanel').style.width = '40%';
-                                        document.getElementById('explanation').textContent = '';
+                                        document.getElementById('explanation').textContent = data.explanation || '';
                                         highlightExecutionPath(nodeId);
                                     });
                             }
@@ -199,15 +654,14 @@ def index():
                         // AI explanation of code
                         document.getElementById('explain-button').addEventListener('click', function() {
                             const code = document.getElementById('code-display').textContent;
+                            document.getElementById('explanation').textContent = 'Explaining...';
                             fetch('/explain_code', {
                                 method: 'POST',
                                 headers: { 'Content-Type': 'application/json' },
-                                body: JSON.stringify({code: code}),
+                                body: JSON.stringify({code: code, wait: false}),
                             })
                             .then(response => response.json())
-                            .then(data => {
-                                document.getElementById('explanation').textContent = data.explanation;
-                            });
+                            .then(showExplanation);
                         });
 
                         // Close button for sidepanel
@@ -217,18 +671,99 @@ def index():
                         });
                     });
 
-                function performSearch() {
+                function showExplanation(data) {
+                    if (data.status === 'queued' || data.status === 'running') {
+                        fetch(`/explain_job/${data.job_id}?wait=10`)
+                            .then(response => response.json())
+                            .then(showExplanation);
+                    } else {
+                        document.getElementById('explanation').textContent = data.explanation || data.error;
+                    }
+                }
+
+                // Search the whole graph on the server, a page of results at a time
+                const SEARCH_PAGE = 20;
+
+                function performSearch(offset) {
                     const searchTerm = document.getElementById('search-input').value;
-                    let foundNode = network.body.data.nodes.get().find(node => node.label === searchTerm);
-                    if (foundNode) {
-                        network.selectNodes([foundNode.id]);
-                        network.focus(foundNode.id, { scale: 1.5 });
+                    const list = document.getElementById('search-results');
+                    if (!searchTerm.trim()) {
+                        list.innerHTML = '';
+                        return;
+                    }
+                    const params = new URLSearchParams({ q: searchTerm, offset: offset, limit: SEARCH_PAGE });
+                    fetch(`${BASE}/search?${params}`)
+                        .then(response => response.json())
+                        .then(data => {
+                            if (offset === 0) {
+                                list.innerHTML = '';
+                            } else if (list.lastChild) {
+                                list.removeChild(list.lastChild);
+                            }
+                            if (data.total === 0) {
+                                addSearchItem(list, 'Nothing found.', '', null);
+                            }
+                            data.results.forEach(result => {
+                                addSearchItem(list, `${result.label} (${result.kind})`, result.qualified,
+                                    () => showSearchResult(result));
+                            });
+                            const shown = offset + data.results.length;
+                            if (shown < data.total) {
+                                addSearchItem(list, `More (${data.total - shown} left)`, '',
+                                    () => performSearch(shown));
+                            }
+                        });
+                }
+
+                function addSearchItem(list, title, detail, onClick) {
+                    const item = document.createElement('li');
+                    item.textContent = title;
+                    if (detail) {
+                        const small = document.createElement('small');
+                        small.textContent = detail;
+                        item.appendChild(small);
+                    }
+                    if (onClick) {
+                        item.addEventListener('click', onClick);
+                    }
+                    list.appendChild(item);
+                }
+
+                function focusNode(nodeId) {
+                    network.selectNodes([nodeId]);
+                    network.focus(nodeId, { scale: 1.5 });
+                }
+
+                // Bring a search result into the loaded graph if needed, then focus it
+                function showSearchResult(result) {
+                    document.getElementById('search-results').innerHTML = '';
+                    const nodes = network.body.data.nodes;
+                    if (nodes.get(result.id)) {
+                        focusNode(result.id);
+                    } else if (clusterDepth !== null) {
+                        revealedNodes.push(result.id);
+                        loadClusters().then(replaceGraph).then(() => focusNode(result.id));
+                    } else if (nodes.get(result.node)) {
+                        focusNode(result.node);
                     } else {
-                        alert('Function not found.');
+                        expandedNodes.push(result.node);
+                        fetch(`${BASE}/neighborhood?node=${encodeURIComponent(result.node)}&depth=1`)
+                            .then(response => response.json())
+                            .then(data => {
+                                nodes.update(data.nodes);
+                                network.body.data.edges.update(withEdgeIds(data.edges));
+                                focusNode(result.node);
+                            });
                     }
                 }
 
                 function highlightExecutionPath(nodeId) {
+                    fetch(`${BASE}/callees?node=${encodeURIComponent(nodeId)}`)
+                        .then(response => response.json())
+                        .then(data => paintExecutionPath(nodeId, data.nodes || []));
+                }
+
+                function paintExecutionPath(nodeId, callees) {
                     resetHighlight();
                     selectedNode = nodeId;
                     
@@ -244,21 +779,30 @@ def index():
                         edge.options.color.color = '#1E1E1E';
                     });
                     
-                    // Highlight the selected node and its connections
+                    // Highlight the selected node, its connections and everything it calls
                     const connectedNodes = network.getConnectedNodes(nodeId);
                     const connectedEdges = network.getConnectedEdges(nodeId);
+                    const reached = new Set(callees.filter(id => id in allNodes));
+                    reached.add(nodeId);
                     
                     allNodes[nodeId].options.color.background = '#FF0000';
                     allNodes[nodeId].options.color.border = '#FF0000';
                     
-                    connectedNodes.forEach(connectedNodeId => {
-                        allNodes[connectedNodeId].options.color.background = '#FFFFFF';
-                        allNodes[connectedNodeId].options.color.border = '#FFFFFF';
+                    connectedNodes.concat(callees).forEach(connectedNodeId => {
+                        if (connectedNodeId in allNodes && connectedNodeId !== nodeId) {
+                            allNodes[connectedNodeId].options.color.background = '#FFFFFF';
+                            allNodes[connectedNodeId].options.color.border = '#FFFFFF';
+                        }
                     });
                     
                     connectedEdges.forEach(edgeId => {
                         allEdges[edgeId].options.color.color = '#FFFFFF';
                     });
+                    Object.values(allEdges).forEach(edge => {
+                        if (reached.has(edge.fromId) && reached.has(edge.toId)) {
+                            edge.options.color.color = '#FFFFFF';
+                        }
+                    });
                     
                     highlightActive = true;
                     network.redraw();
@@ -285,61 +829,595 @@ def index():
             </script>
         </body>
         </html>
-        """
+        """,
+        base=state.base_url(),
     )
 
 
-@app.route("/graph_data")
-def graph_data():
+@graph_route("/graph_data")
+def graph_data(state):
     """
     Serve the graph data for visualization.
     """
-    visjs_data = network_to_visjs(G)
-    return jsonify(visjs_data)
+    return state.payloads.get(state.version).response(request)
+
+
+@graph_route("/graph_stream")
+def graph_stream(state):
+    """
+    Stream the graph as NDJSON, so the page can draw it while it downloads:
+    a line with the totals, then chunks of nodes with the edges between the
+    nodes sent so far. Files come first, then functions by degree.
+    """
+    G = state.G
+    order = state.stream_orders.get(state.version)
+
+    def lines():
+        yield json.dumps(
+            {
+                "version": state.version,
+                "total_nodes": G.number_of_nodes(),
+                "total_edges": G.number_of_edges(),
+            }
+        ) + "\n"
+        for chunk in G.visjs_chunks(order):
+            yield json.dumps(chunk, separators=(",", ":")) + "\n"
+
+    return flask.Response(lines(), mimetype="application/x-ndjson")
+
+
+@graph_route("/clusters")
+def clusters(state):
+    """
+    Serve the graph collapsed to directories, files and classes: the items
+    at `depth` (by default the deepest level with a few hundred of them),
+    with each `expand` cluster opened into its children and the clusters
+    around each `reveal` item opened so it is shown. Edges between clusters
+    carry the number of calls they stand for as their value.
+    """
+    depth = request.args.get("depth", type=int)
+    expanded = request.args.getlist("expand")
+    revealed = request.args.getlist("reveal")
+    if depth is not None and depth < 0:
+        return jsonify({"error": "depth must not be negative."}), 400
+    hierarchy = state.hierarchies.get(state.version)
+    return jsonify(hierarchy.view(depth, expanded, revealed))
+
+
+@graph_route("/search")
+def search(state):
+    """
+    Serve functions, classes, modules and files whose name matches `q`, best
+    first, `limit` results from `offset`.
+    """
+    query = request.args.get("q", "")
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 200)
+    results = state.search_indexes.get(state.version).search(query, offset, limit)
+    return jsonify(dict(results, query=query, offset=offset, limit=limit))
+
+
+@graph_route("/graph_info")
+def graph_info(state):
+    """
+    Size of the graph and a good node to focus on, so the page can decide
+    whether to download everything or start from a neighborhood.
+    """
+    G = state.G
+    return jsonify(
+        {
+            "version": state.version,
+            "watching": state.watching,
+            "layout": G.x is not None,
+            "nodes": G.number_of_nodes(),
+            "edges": G.number_of_edges(),
+            "focus": G.most_connected(),
+        }
+    )
+
+
+@graph_route("/graph_version")
+def graph_version(state):
+    """
+    Current graph version, polled by the page to notice re-indexed files.
+    """
+    return jsonify({"version": state.version, "watching": state.watching})
+
+
+@graph_route("/neighborhood")
+def neighborhood(state):
+    """
+    Serve the k-hop callers and/or callees of a node, capped in size.
+    """
+    node = request.args.get("node")
+    depth = min(request.args.get("depth", 1, type=int), 10)
+    direction = request.args.get("direction", "both")
+    max_nodes = min(request.args.get("max_nodes", 500, type=int), 5000)
+    max_edges = min(request.args.get("max_edges", 2000, type=int), 20000)
+
+    G = state.G
+    if node not in G.ids:
+        return jsonify({"error": "Unknown node."}), 404
+    if direction not in DIRECTIONS:
+        return jsonify({"error": f"direction must be one of {DIRECTIONS}."}), 400
+
+    nodes, edges, truncated = G.neighborhood(
+        node, depth, direction, max_nodes, max_edges
+    )
+    data = network_to_visjs(G, nodes, edges)
+    data["truncated"] = truncated
+    return jsonify(data)
+
+
+def _transitive(state, query):
+    node = request.args.get("node")
+    limit = min(request.args.get("limit", 10000, type=int), 100000)
+    engine = state.engines.get(state.version)
+    if node not in engine.index.ids:
+        return jsonify({"error": "Unknown node."}), 404
+    nodes, truncated = query(engine, node, limit)
+    return jsonify({"node": node, "nodes": nodes, "truncated": truncated})
+
+
+@graph_route("/callees")
+def callees(state):
+    """
+    Serve every function transitively called by a node.
+    """
+    return _transitive(state, ReachabilityEngine.callees)
+
+
+@graph_route("/callers")
+def callers(state):
+    """
+    Serve every function that transitively calls a node.
+    """
+    return _transitive(state, ReachabilityEngine.callers)
+
+
+def _source_and_target(state):
+    engine = state.engines.get(state.version)
+    source = request.args.get("source")
+    target = request.args.get("target")
+    for node in (source, target):
+        if node not in engine.index.ids:
+            return engine, source, target, (jsonify({"error": "Unknown node."}), 404)
+    return engine, source, target, None
+
+
+@graph_route("/reachable")
+def reachable(state):
+    """
+    Tell whether the target function can be reached from the source function.
+    """
+    engine, source, target, error = _source_and_target(state)
+    if error:
+        return error
+    return jsonify(
+        {
+            "source": source,
+            "target": target,
+            "reachable": engine.reachable(source, target),
+        }
+    )
+
+
+@graph_route("/call_path")
+def call_path(state):
+    """
+    Serve the shortest call chain from the source function to the target.
+    """
+    engine, source, target, error = _source_and_target(state)
+    if error:
+        return error
+    return jsonify(
+        {
+            "source": source,
+            "target": target,
+            "path": engine.shortest_path(source, target),
+        }
+    )
 
 
-@app.route("/get_code")
-def get_code():
+@graph_route("/get_code")
+def get_code(state):
     """
     Serve the code for a clicked node.
     """
     node = request.args.get("node")
-    return jsonify({"code": code_contents.get(node, "Code not found.")})
+    # Only the clicked file or function is read, straight from disk.
+    code = state.source_index.source(node)
+    data = {"code": "Code not found." if code is None else code}
+    explanation = node_explanation(node, state.source_index, explanations)
+    if explanation is not None:
+        data["explanation"] = explanation
+    return jsonify(data)
+
+
+def collect_metrics():
+    """
+    Update the gauges /metrics reports from the current state.
+    """
+    metrics.EXPLAIN_QUEUE_DEPTH.set(inference_worker.queue_depth())
+    metrics.PAYLOAD_BYTES.clear()
+    metrics.GRAPH_SIZE.clear()
+    states = [graph] + ([] if repos is None else list(repos.loaded.values()))
+    for state in states:
+        if state.G is None:
+            continue
+        name = state.name or ""
+        metrics.GRAPH_SIZE.set(state.G.number_of_nodes(), repo=name, element="nodes")
+        metrics.GRAPH_SIZE.set(state.G.number_of_edges(), repo=name, element="edges")
+        payload = state.payloads.peek()
+        if payload is not None:
+            for encoding, body in payload.bodies.items():
+                metrics.PAYLOAD_BYTES.set(len(body), repo=name, encoding=encoding)
+
+
+# Request timings per route and the /metrics endpoint
+metrics.instrument(app, collect_metrics)
+
+
+@app.route("/repos")
+def list_repos():
+    """
+    The hosted repositories, whether they are loaded and their approximate size.
+    """
+    return jsonify([] if repos is None else repos.status())
 
 
 @app.route("/explain_code", methods=["POST"])
 def explain_code():
     """
     Explain the code using AI when the user clicks the 'Explain' button.
+    The explanation runs on the inference worker; with "wait": false the
+    response only carries a job id to poll at /explain_job/<job_id>.
     """
     code = request.json.get("code")
-    explanation = explainer(code)[0]["summary_text"]
-    return jsonify({"explanation": explanation})
+    timeout = request.json.get("timeout")
+    if timeout is None:
+        timeout = inference_worker.timeout
+    if (
+        not isinstance(timeout, (int, float))
+        or isinstance(timeout, bool)
+        or not timeout > 0
+    ):
+        return jsonify({"error": "timeout must be a positive number."}), 400
+    # Never wait longer than the server allows, see --explain-timeout
+    timeout = min(timeout, inference_worker.timeout)
+    try:
+        job, cached = inference_worker.submit(code, timeout)
+    except queue.Full:
+        response = jsonify({"error": "Too many pending explanations, retry later."})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    if request.json.get("wait", True):
+        job.wait(timeout)
+    data = job.to_dict()
+    data["cached"] = data["cached"] or cached
+    return jsonify(data), 200 if job.finished_at is not None else 202
+
+
+@app.route("/explain_job/<job_id>")
+def explain_job(job_id):
+    """
+    Report the state of an explanation job, waiting up to ?wait= seconds for it.
+    """
+    job = inference_worker.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    job.wait(min(request.args.get("wait", 0, type=float), 30))
+    return jsonify(job.to_dict()), 200 if job.finished_at is not None else 202
 
 
 if __name__ == "__main__":
-    # Sample directory to parse (replace with your directory)
-    directory_path = input("Enter the path to the directory to parse: ")
-    print(f"Parsing directory: {directory_path}")
-
-    omit_dirs = input("Enter the directories to omit (comma-separated): ").split(",")
-    print(f"Omitting directories: {omit_dirs}")
-
-    python_files = parse_directory(directory_path, omit_dirs)
-
-    # Parse files and extract functions and imports
-    all_functions = {}
-    all_imports = set()
-    for file_path in python_files:
-        tree = parse_file(file_path)
-        functions, imports = extract_functions_and_imports(tree)
-        for func_name, func_data in functions.items():
-            func_data["file"] = file_path
-            all_functions[func_name] = func_data
-        all_imports.update(imports)
-
-    # Create the graph
-    G = create_graph_with_directory_structure(all_functions, all_imports, python_files)
+    parser = argparse.ArgumentParser(description="Visualize a Python codebase.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["index", "build", "serve"],
+        default="index",
+        help="'index' (default) indexes a directory and serves it, 'build' "
+        "indexes it into a snapshot file, 'serve' serves a snapshot file "
+        "without parsing anything.",
+    )
+    parser.add_argument(
+        "--directory", help="Directory to index, asked for when not given."
+    )
+    parser.add_argument(
+        "--omit",
+        default=None,
+        help="Comma-separated directories to omit, asked for when not given.",
+    )
+    parser.add_argument(
+        "--snapshot", help="Snapshot file written by 'build' and read by 'serve'."
+    )
+    parser.add_argument(
+        "--summaries",
+        help="Build the graph from the summaries of a commit written by "
+        "git_index.py instead of parsing --directory. Source code is still "
+        "read from the working tree.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=default_jobs(),
+        help="Number of worker processes used to parse files (default: CPU count).",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=DEFAULT_CACHE_PATH,
+        help="Location of the persistent parse cache.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-parse every file instead of reusing cached results.",
+    )
+    parser.add_argument(
+        "--explainer-load",
+        choices=["lazy", "background", "eager"],
+        default="lazy",
+        help="When to load the explanation model: on the first 'Explain' click, "
+        "in a background thread once the server starts, or before starting it.",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Run the explanation model on CPU with int8 dynamic quantization.",
+    )
+    parser.add_argument(
+        "--explainer-threads",
+        type=int,
+        default=None,
+        help="Maximum number of CPU threads used by the explanation model.",
+    )
+    parser.add_argument(
+        "--explain-cache-size",
+        type=int,
+        default=1024,
+        help="Number of explanations kept in memory.",
+    )
+    parser.add_argument(
+        "--explain-cache-path",
+        default=None,
+        help="Also keep explanations in this SQLite file across restarts.",
+    )
+    parser.add_argument(
+        "--precompute-explanations",
+        action="store_true",
+        help="Explain every function in the background after indexing, most "
+        "connected first. Results are kept in the explanation cache file.",
+    )
+    parser.add_argument(
+        "--explain-batch-size",
+        type=int,
+        default=8,
+        help="Maximum number of explanations generated in one model call.",
+    )
+    parser.add_argument(
+        "--explain-batch-wait-ms",
+        type=float,
+        default=50,
+        help="How long the inference worker waits for a batch to fill up.",
+    )
+    parser.add_argument(
+        "--explain-queue-size",
+        type=int,
+        default=64,
+        help="Pending explanations allowed before requests are rejected.",
+    )
+    parser.add_argument(
+        "--explain-timeout",
+        type=float,
+        default=120,
+        help="Seconds an explanation may wait before it is abandoned.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep watching the directory and update the graph when files change.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between scans, or to collect file events, in watch mode.",
+    )
+    parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        metavar="NAME=SNAPSHOT",
+        help="Also serve the snapshot of another repository under /repo/NAME/. "
+        "Repeat for more repositories; they share the explanation model.",
+    )
+    parser.add_argument(
+        "--repo-memory-mb",
+        type=int,
+        default=1024,
+        help="Memory budget for loaded --repo graphs, least recently used "
+        "ones are unloaded above it.",
+    )
+    parser.add_argument(
+        "--profile-slowest",
+        type=int,
+        default=0,
+        metavar="N",
+        help="After indexing, parse the N slowest files again under cProfile "
+        "and tracemalloc and print where the time and memory went.",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="Also write the --profile-slowest profiles here as .prof files.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["server", "browser"],
+        default="server",
+        help="Compute node positions once on the server (default), or let the "
+        "browser lay the graph out with its physics simulation.",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Call trace written by tracer.py. Traced calls are added to the "
+        "graph and functions are sized and colored by how often they ran.",
+    )
+    args = parser.parse_args()
+    server_layout = args.layout == "server"
+    if args.trace is not None:
+        runtime_trace = load_trace(args.trace)
+    if args.precompute_explanations and args.explain_cache_path is None:
+        args.explain_cache_path = DEFAULT_EXPLANATION_CACHE_PATH
+    explainer = Explainer(quantize=args.quantize, num_threads=args.explainer_threads)
+    explanations = ExplanationCache(
+        explainer.settings(),
+        max_entries=args.explain_cache_size,
+        disk_path=args.explain_cache_path,
+    )
+    inference_worker = InferenceWorker(
+        explainer.explain_batch,
+        explanations,
+        max_batch_size=args.explain_batch_size,
+        max_wait=args.explain_batch_wait_ms / 1000,
+        max_queue=args.explain_queue_size,
+        timeout=args.explain_timeout,
+    )
+
+    if args.command == "build" and args.snapshot is None:
+        parser.error("'build' needs --snapshot")
+    if args.command == "serve" and args.snapshot is None and not args.repo:
+        parser.error("'serve' needs --snapshot or --repo")
+
+    if args.repo:
+        snapshots = dict(repo.split("=", 1) for repo in args.repo)
+        repos = RepoRegistry(
+            snapshots,
+            lambda name, path: GraphState.from_snapshot(path, name),
+            args.repo_memory_mb * 1024 * 1024,
+        )
+        print(f"Hosting {len(snapshots)} repositories under /repo/<name>/")
+
+    symbols = None
+    summaries = None
+    if args.command == "serve":
+        if args.snapshot is not None:
+            graph = GraphState.from_snapshot(args.snapshot)
+            print(f"Serving {args.snapshot}")
+    elif args.summaries is not None:
+        # Summaries of a commit from git_index.py, nothing is parsed
+        commit_snapshot = load_summaries(args.summaries)
+        directory_path = commit_snapshot["root"]
+        omit_dirs = commit_snapshot["omit_dirs"]
+        summaries = commit_snapshot["summaries"]
+        python_files = [summary["path"] for summary in summaries]
+        print(
+            f"Loaded {len(summaries)} file summaries of {directory_path} at "
+            f"{commit_snapshot['commit'][:12]}"
+        )
+    else:
+        directory_path = args.directory
+        if directory_path is None:
+            directory_path = input("Enter the path to the directory to parse: ")
+        print(f"Parsing directory: {directory_path}")
+
+        omit_dirs = args.omit
+        if omit_dirs is None:
+            omit_dirs = input("Enter the directories to omit (comma-separated): ")
+        omit_dirs = omit_dirs.split(",")
+        print(f"Omitting directories: {omit_dirs}")
+
+        python_files = timed(
+            "discover", lambda: parse_directory(directory_path, omit_dirs)
+        )
+
+        # Parse files and extract functions and imports
+        print(f"Indexing {len(python_files)} files with {args.jobs} worker(s)")
+        cache = None if args.no_cache else ParseCache(args.cache_path, namespace="main")
+        timings = {}
+        summaries, elapsed = timed_index(
+            python_files, jobs=args.jobs, cache=cache, timings=timings
+        )
+        print(f"Indexed {len(python_files) / max(elapsed, 1e-9):.0f} files/s")
+        if cache is not None:
+            print(cache.report())
+            cache.close()
+        if args.profile_slowest:
+            profile_slowest(timings, args.profile_slowest, args.profile_dir)
+
+    if summaries is not None:
+        if runtime_trace is not None and runtime_trace["root"] != os.path.abspath(
+            directory_path
+        ):
+            print(
+                f"Note: {args.trace} traced {runtime_trace['root']}, only functions "
+                "with the same qualified names are matched."
+            )
+
+        # Resolve calls and create the graph
+        symbols = install_graph(directory_path, summaries)
+        print(f"Resolved {symbols.resolved} calls, {symbols.unresolved} unresolved")
+
+        if args.command == "build":
+            timed(
+                "snapshot_save",
+                lambda: save_snapshot(
+                    args.snapshot,
+                    graph.G,
+                    graph.source_index.spans,
+                    {"directory": directory_path, "files": len(python_files)},
+                ),
+            )
+            print(f"Wrote {args.snapshot}")
+            raise SystemExit(0)
+
+    # The debug reloader's watcher process never serves requests, so only the
+    # serving process loads the model.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        if args.explainer_load == "eager":
+            explainer.load()
+        elif args.explainer_load == "background":
+            explainer.warm_in_background()
+
+        if args.precompute_explanations and graph.G is not None:
+
+            def report_precompute(generated, skipped, total):
+                print(f"Explanations: {generated + skipped}/{total} ready")
+
+            threading.Thread(
+                target=precompute_explanations,
+                args=(
+                    graph.G,
+                    graph.functions,
+                    graph.source_index,
+                    explanations,
+                    inference_worker,
+                ),
+                kwargs={
+                    "batch_size": args.explain_batch_size,
+                    "progress": report_precompute,
+                },
+                name="explanation-precompute",
+                daemon=True,
+            ).start()
+
+        if args.watch and symbols is not None:
+            graph.watching = True
+            watcher = make_watcher(directory_path, omit_dirs, args.watch_interval)
+            print(f"Watching {directory_path} with {type(watcher).__name__}")
+            threading.Thread(
+                target=watch_directory,
+                args=(
+                    symbols,
+                    watcher,
+                    None if args.no_cache else args.cache_path,
+                ),
+                name="directory-watcher",
+                daemon=True,
+            ).start()
 
     # Run the Flask app
     app.run(debug=True)
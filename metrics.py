@@ -0,0 +1,279 @@
+import time
+import threading
+import contextlib
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, 300)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    A named family of values, one per combination of label values.
+    Updates take a lock, so metrics can be shared by threads.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """
+        (label values, value) of every sample, in label order.
+        """
+        with self._lock:
+            return [(key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, value in self.samples():
+            lines.append(
+                f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    """
+    Counts of observations below each bucket bound, with their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=TIME_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in sorted(values):
+            for bound, count in zip(self.buckets, counts):
+                le = (("le", _format_value(bound)),)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {counts[-2]}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics reported by /metrics, in Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "codeflowmapper_stage_seconds",
+        "Time spent in each pipeline stage.",
+        ["stage"],
+    )
+)
+FILE_SECONDS = REGISTRY.register(
+    Histogram(
+        "codeflowmapper_file_seconds",
+        "Time spent per file reading it and parsing and summarizing it.",
+        ["phase"],
+    )
+)
+FILES_INDEXED = REGISTRY.register(
+    Counter("codeflowmapper_files_indexed_total", "Files indexed, parsed or cached.")
+)
+FILES_PER_SECOND = REGISTRY.register(
+    Gauge(
+        "codeflowmapper_index_files_per_second",
+        "Files indexed per second by the last indexing run.",
+    )
+)
+PARSE_CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "codeflowmapper_parse_cache_requests_total",
+        "Parse cache lookups by result.",
+        ["result"],
+    )
+)
+EXPLANATION_CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "codeflowmapper_explanation_cache_requests_total",
+        "Explanation cache lookups by result.",
+        ["result"],
+    )
+)
+EXPLAIN_QUEUE_SECONDS = REGISTRY.register(
+    Histogram(
+        "codeflowmapper_explain_queue_seconds",
+        "Time explanations wait in the queue before the model runs.",
+    )
+)
+EXPLAIN_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("codeflowmapper_explain_queue_depth", "Explanations waiting to run.")
+)
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "codeflowmapper_request_seconds",
+        "Time spent handling HTTP requests, by route.",
+        ["route"],
+    )
+)
+REQUESTS = REGISTRY.register(
+    Counter(
+        "codeflowmapper_requests_total",
+        "HTTP requests by route and status.",
+        ["route", "status"],
+    )
+)
+RESPONSE_BYTES = REGISTRY.register(
+    Histogram(
+        "codeflowmapper_response_bytes",
+        "Size of HTTP response bodies, by route. Streamed responses are not counted.",
+        ["route"],
+        SIZE_BUCKETS,
+    )
+)
+PAYLOAD_BYTES = REGISTRY.register(
+    Gauge(
+        "codeflowmapper_graph_payload_bytes",
+        "Size of the cached /graph_data payload, by repository and encoding.",
+        ["repo", "encoding"],
+    )
+)
+GRAPH_SIZE = REGISTRY.register(
+    Gauge(
+        "codeflowmapper_graph_size",
+        "Nodes and edges of the served graph, by repository.",
+        ["repo", "element"],
+    )
+)
+
+
+def timed(stage: str, build):
+    """
+    Call `build` and record how long it took as `stage`.
+    """
+    with STAGE_SECONDS.time(stage=stage):
+        return build()
+
+
+def instrument(app, collect=None):
+    """
+    Time every request of a Flask app by route and serve the registry at
+    /metrics. `collect` is called before each scrape to update gauges.
+    """
+    # Imported here so indexing workers, which import this module, stay light
+    import flask
+
+    @app.before_request
+    def start_timer():
+        flask.g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = flask.g.pop("metrics_start", None)
+        rule = flask.request.url_rule
+        route = rule.rule if rule is not None else "unmatched"
+        if start is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+        REQUESTS.inc(route=route, status=response.status_code)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, route=route)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        if collect is not None:
+            collect()
+        return flask.Response(
+            REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    return metrics
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from metrics import PARSE_CACHE_REQUESTS
+
+# Bump whenever the layout of the cached summaries changes, old entries are dropped.
+CACHE_SCHEMA_VERSION = 6
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "codeflowmapper",
+    "parse_cache.sqlite3",
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(data: bytes):
+    """
+    Hash the raw bytes of a source file.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of per-file extraction summaries.
+
+    Entries are keyed by path and validated against the file size, mtime and
+    content hash. A file whose size and mtime are unchanged is served without
+    being read; a file that was only touched is read and hashed but not parsed.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        namespace: str = "main",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._stats = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self._init_schema()
+
+    def _init_schema(self):
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'schema_version'"
+        ).fetchone()
+        if row is None or int(row[0]) != CACHE_SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS entries")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)",
+                (str(CACHE_SCHEMA_VERSION),),
+            )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, path)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+        self.conn.commit()
+
+    def get(self, file_path: str):
+        """
+        Return the cached summary for a file, or None if it has to be re-parsed.
+        """
+        st = os.stat(file_path)
+        self._stats[file_path] = (st.st_size, st.st_mtime_ns)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, content_hash, summary FROM entries "
+            "WHERE namespace = ? AND path = ?",
+            (self.namespace, file_path),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            PARSE_CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        size, mtime_ns, cached_hash, summary = row
+        if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+            # The file was touched, it only needs re-parsing if the bytes changed.
+            with open(file_path, "rb") as f:
+                if content_hash(f.read()) != cached_hash:
+                    self.misses += 1
+                    PARSE_CACHE_REQUESTS.inc(result="miss")
+                    return None
+            self.conn.execute(
+                "UPDATE entries SET size = ?, mtime_ns = ? "
+                "WHERE namespace = ? AND path = ?",
+                (st.st_size, st.st_mtime_ns, self.namespace, file_path),
+            )
+
+        self.conn.execute(
+            "UPDATE entries SET last_used = ? WHERE namespace = ? AND path = ?",
+            (time.time(), self.namespace, file_path),
+        )
+        self.hits += 1
+        PARSE_CACHE_REQUESTS.inc(result="hit")
+        return json.loads(summary)
+
+    def put(self, file_path: str, summary: dict):
+        """
+        Store the summary of a freshly parsed file.
+        The summary must carry the content hash of the bytes it was built from.
+        """
+        if file_path not in self._stats:
+            st = os.stat(file_path)
+            self._stats[file_path] = (st.st_size, st.st_mtime_ns)
+        size, mtime_ns = self._stats[file_path]
+        payload = json.dumps(summary)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.namespace,
+                file_path,
+                size,
+                mtime_ns,
+                summary["hash"],
+                payload,
+                len(payload),
+                time.time(),
+            ),
+        )
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in `max_bytes`.
+        """
+        total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries")
+        total = total.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute(
+            "SELECT namespace, path, nbytes FROM entries ORDER BY last_used"
+        ).fetchall()
+        for namespace, path, nbytes in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND path = ?",
+                (namespace, path),
+            )
+            total -= nbytes
+
+    def flush(self):
+        """
+        Enforce the size bound and persist pending writes.
+        """
+        self.evict()
+        self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def report(self):
+        return f"Parse cache: {self.hits} hits, {self.misses} misses"
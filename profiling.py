@@ -0,0 +1,64 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import tracemalloc
+from indexer import summarize_source
+
+
+def slowest_files(timings: dict, count: int):
+    """
+    The `count` files that took longest to read and summarize, from the
+    timings index_files collects.
+    """
+    return sorted(timings, key=lambda path: sum(timings[path]), reverse=True)[:count]
+
+
+def profile_file(file_path: str, summarize=summarize_source, output_dir=None):
+    """
+    Summarize one file again under cProfile and tracemalloc. Returns its time,
+    peak memory and the functions it spent most time in. The full profile is
+    written to `output_dir`, for pstats or snakeviz, when one is given.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        summarize(file_path, data)
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    report = {"path": file_path, "bytes": len(data), "seconds": seconds, "peak": peak}
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        name = file_path.strip(os.sep).replace(os.sep, "_") + ".prof"
+        report["profile"] = os.path.join(output_dir, name)
+        profiler.dump_stats(report["profile"])
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(8)
+    report["top"] = text.getvalue()
+    return report
+
+
+def profile_slowest(timings: dict, count: int, output_dir=None):
+    """
+    Profile the `count` slowest files of an indexing run and print a summary.
+    """
+    for file_path in slowest_files(timings, count):
+        read, parse = timings[file_path]
+        report = profile_file(file_path, output_dir=output_dir)
+        print(
+            f"{file_path}: {report['bytes'] / 1e3:.1f}kB, read {read * 1000:.1f}ms, "
+            f"parse {parse * 1000:.1f}ms, profiled {report['seconds'] * 1000:.1f}ms, "
+            f"peak {report['peak'] / 1e6:.1f}MB"
+        )
+        if "profile" in report:
+            print(f"  profile written to {report['profile']}")
+        print(report["top"])
@@ -0,0 +1,208 @@
+from collections import deque
+from functools import lru_cache
+
+# Above this many components, reachability sets are computed per query
+# (and memoized) instead of precomputing a bitset for every component.
+BITSET_LIMIT = 20000
+
+
+def strongly_connected_components(num_nodes: int, successors):
+    """
+    Iterative Tarjan. Returns (component of each node, number of components).
+    Components are numbered in reverse topological order: every edge of the
+    condensation goes from a higher to a lower component id.
+    """
+    index = [-1] * num_nodes
+    low = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    component = [-1] * num_nodes
+    stack = []
+    counter = 0
+    num_components = 0
+
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, successors(root), 0)]
+
+        while work:
+            v, neighbors, position = work[-1]
+            if position < len(neighbors):
+                work[-1] = (v, neighbors, position + 1)
+                w = neighbors[position]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, successors(w), 0))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = num_components
+                    if w == v:
+                        break
+                num_components += 1
+
+    return component, num_components
+
+
+def _bits(bitset: int):
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+class ReachabilityEngine:
+    """
+    Transitive caller/callee queries over the strongly connected component
+    condensation of the call graph.
+
+    Built once per graph version from a GraphIndex. Only nodes in `keep`
+    (the function nodes) take part, so containment edges from files or
+    directories never show up as calls. Reachability between components is
+    a bitset test; shortest call paths run a BFS pruned to the nodes that
+    can still reach the target.
+    """
+
+    def __init__(self, index, keep):
+        self.index = index
+        self.keep = [node in keep for node in index.nodes]
+        num_nodes = len(index.nodes)
+
+        def successors(i):
+            if not self.keep[i]:
+                return ()
+            return [j for j in index.successors(i) if self.keep[j]]
+
+        self.component, self.num_components = strongly_connected_components(
+            num_nodes, successors
+        )
+
+        self.members = [[] for _ in range(self.num_components)]
+        for i in range(num_nodes):
+            self.members[self.component[i]].append(i)
+
+        self.dag_succ = [set() for _ in range(self.num_components)]
+        self.dag_pred = [set() for _ in range(self.num_components)]
+        for i in range(num_nodes):
+            for j in successors(i):
+                a, b = self.component[i], self.component[j]
+                if a != b:
+                    self.dag_succ[a].add(b)
+                    self.dag_pred[b].add(a)
+
+        # Memoized per engine, so closures of old graph versions are freed with it.
+        self._closure = lru_cache(maxsize=1024)(self._compute_closure)
+        self._descendants = None
+        self._ancestors = None
+        if self.num_components <= BITSET_LIMIT:
+            self._descendants = [0] * self.num_components
+            for c in range(self.num_components):
+                bitset = 1 << c
+                for d in self.dag_succ[c]:
+                    bitset |= self._descendants[d]
+                self._descendants[c] = bitset
+            self._ancestors = [0] * self.num_components
+            for c in reversed(range(self.num_components)):
+                bitset = 1 << c
+                for p in self.dag_pred[c]:
+                    bitset |= self._ancestors[p]
+                self._ancestors[c] = bitset
+
+    def _compute_closure(self, c: int, forward: bool):
+        edges = self.dag_succ if forward else self.dag_pred
+        bitset = 1 << c
+        queue = deque([c])
+        while queue:
+            for d in edges[queue.popleft()]:
+                if not bitset >> d & 1:
+                    bitset |= 1 << d
+                    queue.append(d)
+        return bitset
+
+    def descendants(self, c: int):
+        if self._descendants is not None:
+            return self._descendants[c]
+        return self._closure(c, True)
+
+    def ancestors(self, c: int):
+        if self._ancestors is not None:
+            return self._ancestors[c]
+        return self._closure(c, False)
+
+    def _expand(self, node, bitset: int, limit: int):
+        start = self.index.ids[node]
+        result = []
+        for c in _bits(bitset):
+            for i in self.members[c]:
+                if i == start:
+                    continue
+                if len(result) >= limit:
+                    return result, True
+                result.append(self.index.nodes[i])
+        return result, False
+
+    def callees(self, node, limit: int = 10000):
+        """
+        Every function reachable from `node`, and whether `limit` cut it short.
+        """
+        c = self.component[self.index.ids[node]]
+        return self._expand(node, self.descendants(c), limit)
+
+    def callers(self, node, limit: int = 10000):
+        """
+        Every function that can reach `node`, and whether `limit` cut it short.
+        """
+        c = self.component[self.index.ids[node]]
+        return self._expand(node, self.ancestors(c), limit)
+
+    def reachable(self, source, target):
+        a = self.component[self.index.ids[source]]
+        b = self.component[self.index.ids[target]]
+        # Components are reverse topologically ordered, so a lower id never
+        # reaches a higher one.
+        if a < b:
+            return False
+        return bool(self.descendants(a) >> b & 1)
+
+    def shortest_path(self, source, target):
+        """
+        Shortest call chain from `source` to `target` as a list of nodes, or None.
+        """
+        if not self.keep[self.index.ids[source]] or not self.reachable(source, target):
+            return None
+        start, goal = self.index.ids[source], self.index.ids[target]
+        can_reach_goal = self.ancestors(self.component[goal])
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            if current == goal:
+                path = []
+                while current is not None:
+                    path.append(self.index.nodes[current])
+                    current = parents[current]
+                return path[::-1]
+            for neighbor in self.index.successors(current):
+                if neighbor in parents or not self.keep[neighbor]:
+                    continue
+                if can_reach_goal >> self.component[neighbor] & 1:
+                    parents[neighbor] = current
+                    queue.append(neighbor)
+        return None
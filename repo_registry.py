@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+
+class RepoRegistry:
+    """
+    Repositories hosted by one server, by name. A repository is loaded on
+    first access and kept in least recently used order; when the loaded ones
+    hold more than `max_bytes`, the least recently used are dropped and
+    loaded again when next requested. The most recent one always stays.
+
+    `load(name, source)` returns the loaded repository, which must report
+    its size with an `nbytes()` method. Sizes are re-read on every eviction
+    pass, so data a repository builds lazily is accounted for too.
+    """
+
+    def __init__(self, sources: dict, load, max_bytes: int):
+        self.sources = sources
+        self.load = load
+        self.max_bytes = max_bytes
+        self.loaded = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.sources
+
+    def get(self, name: str):
+        with self._lock:
+            repo = self.loaded.get(name)
+            if repo is not None:
+                self.loaded.move_to_end(name)
+                return repo
+            repo = self.load(name, self.sources[name])
+            self.loads += 1
+            self.loaded[name] = repo
+            self._evict()
+            return repo
+
+    def _evict(self):
+        total = sum(repo.nbytes() for repo in self.loaded.values())
+        while total > self.max_bytes and len(self.loaded) > 1:
+            _, repo = self.loaded.popitem(last=False)
+            total -= repo.nbytes()
+            self.evictions += 1
+
+    def status(self):
+        with self._lock:
+            self._evict()
+            return [
+                {
+                    "name": name,
+                    "loaded": name in self.loaded,
+                    "bytes": self.loaded[name].nbytes() if name in self.loaded else 0,
+                }
+                for name in self.sources
+            ]
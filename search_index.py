@@ -0,0 +1,194 @@
+import bisect
+
+import numpy as np
+
+from graph_store import KINDS
+
+# Kinds of graph nodes that are searched; classes come from the groups column.
+SEARCHED_KINDS = ("function", "file", "import")
+
+# Share of the query's trigrams a name needs for a fuzzy match. Fuzzy
+# matches are only looked for when nothing matches exactly.
+FUZZY_THRESHOLD = 0.5
+
+# Rank of each way a name can match, lower is better
+EXACT = 0
+NAME_PREFIX = 1
+QUALIFIED_PREFIX = 2
+NAME_SUBSTRING = 3
+QUALIFIED_SUBSTRING = 4
+FUZZY = 5
+NO_MATCH = 6
+
+
+def trigram_codes(data: bytes):
+    """
+    The byte trigrams of `data` as integers, in order.
+    """
+    b = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    if len(b) < 3:
+        return np.zeros(0, dtype=np.int64)
+    return b[:-2] << 16 | b[1:-1] << 8 | b[2:]
+
+
+class SearchIndex:
+    """
+    Search over the function, class, module and file names of a GraphStore.
+
+    Each entry has a short name (the label) and a qualified name (the node
+    key, the file path or the class's qualified name). Prefixes are found by
+    binary search in both names sorted case-insensitively. Substrings and
+    misspellings are found through trigram postings: the sorted entry ids
+    of every byte trigram of the lowercase qualified names, stored as one
+    NumPy array with offsets, so a query is a few searchsorted calls and
+    intersections however many names there are.
+    """
+
+    def __init__(self, G):
+        self.ids = []
+        self.labels = []
+        self.kinds = []
+        self.qualified = []
+        self.nodes = []
+
+        kinds = np.frombuffer(G.kinds, dtype=np.uint8)
+        searched = np.isin(kinds, [KINDS.index(kind) for kind in SEARCHED_KINDS])
+        for i in np.flatnonzero(searched).tolist():
+            self._add(G.nodes[i], G.label(i), KINDS[kinds[i]], G.nodes[i], i)
+        if G.groups is not None:
+            groups = np.asarray(G.groups, dtype=np.int64)
+            # A class is shown through its first method.
+            group_ids, first = np.unique(groups, return_index=True)
+            for group_id, i in zip(group_ids.tolist(), first.tolist()):
+                if group_id >= 0:
+                    name = G.strings[group_id]
+                    self._add(
+                        "class:" + name, name.rpartition(".")[2], "class", name, i
+                    )
+        self.G = G
+
+        self.names = [label.lower() for label in self.labels]
+        self.texts = [qualified.lower() for qualified in self.qualified]
+        name_order = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self.sorted_names = [self.names[e] for e in name_order]
+        self.name_order = np.array(name_order, dtype=np.int64)
+        text_order = sorted(range(len(self.texts)), key=self.texts.__getitem__)
+        self.sorted_texts = [self.texts[e] for e in text_order]
+        self.text_order = np.array(text_order, dtype=np.int64)
+        # Tie-breakers when ranking: shorter names, then qualified names in order
+        self.name_lengths = np.array([len(name) for name in self.names])
+        self.text_ranks = np.empty(len(self.texts), dtype=np.int64)
+        self.text_ranks[self.text_order] = np.arange(len(self.texts))
+        self._build_postings()
+
+    def _add(self, key, label, kind, qualified, node):
+        self.ids.append(key)
+        self.labels.append(label)
+        self.kinds.append(kind)
+        self.qualified.append(qualified)
+        self.nodes.append(node)
+
+    def _build_postings(self):
+        encoded = [text.encode("utf-8") for text in self.texts]
+        lengths = np.array([len(data) for data in encoded], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        codes = trigram_codes(b"\n".join(encoded))
+        entries = np.searchsorted(starts, np.arange(len(codes)), side="right") - 1
+        # Trigrams running into the next name are not part of either.
+        keep = np.arange(len(codes)) + 3 <= starts[entries] + lengths[entries]
+        # Sorted (trigram, entry) pairs without duplicates
+        pairs = np.sort(codes[keep] * len(encoded) + entries[keep])
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])] if len(pairs) else pairs
+        codes = pairs // max(len(encoded), 1)
+        self.postings = pairs % max(len(encoded), 1)
+        self.trigrams, self.offsets = np.unique(codes, return_index=True)
+        self.offsets = np.append(self.offsets, len(codes))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _posting(self, code: int):
+        position = np.searchsorted(self.trigrams, code)
+        if position == len(self.trigrams) or self.trigrams[position] != code:
+            return np.zeros(0, dtype=np.int64)
+        return self.postings[self.offsets[position] : self.offsets[position + 1]]
+
+    @staticmethod
+    def _range(sorted_strings: list, prefix: str):
+        low = bisect.bisect_left(sorted_strings, prefix)
+        high = bisect.bisect_left(sorted_strings, prefix + "\U0010ffff", low)
+        return low, high
+
+    def ranked(self, query: str):
+        """
+        Entries matching `query`, best first, and their similarity to it.
+        """
+        query = query.strip().lower()
+        rank = np.full(len(self.ids), NO_MATCH, dtype=np.int8)
+        if not query:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        def found(entries, match):
+            rank[entries] = np.minimum(rank[entries], match)
+
+        low, high = self._range(self.sorted_names, query)
+        found(self.name_order[low:high], NAME_PREFIX)
+        exact = bisect.bisect_right(self.sorted_names, query, low, high)
+        found(self.name_order[low:exact], EXACT)
+        low, high = self._range(self.sorted_texts, query)
+        found(self.text_order[low:high], QUALIFIED_PREFIX)
+
+        codes = np.unique(trigram_codes(query.encode("utf-8")))
+        postings = sorted((self._posting(code) for code in codes), key=len)
+        if postings:
+            candidates = postings[0]
+            for posting in postings[1:]:
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            candidates = candidates.tolist()
+            names, texts = self.names, self.texts
+            found([e for e in candidates if query in names[e]], NAME_SUBSTRING)
+            found([e for e in candidates if query in texts[e]], QUALIFIED_SUBSTRING)
+
+        matched = np.flatnonzero(rank < NO_MATCH)
+        similarity = np.ones(len(matched))
+        if not len(matched) and postings:
+            entries, counts = np.unique(np.concatenate(postings), return_counts=True)
+            similar = counts >= FUZZY_THRESHOLD * len(codes)
+            matched = entries[similar]
+            rank[matched] = FUZZY
+            similarity = counts[similar] / len(codes)
+
+        order = np.lexsort(
+            (
+                self.text_ranks[matched],
+                self.name_lengths[matched],
+                -similarity,
+                rank[matched],
+            )
+        )
+        return matched[order], similarity[order]
+
+    def search(self, query: str, offset: int = 0, limit: int = 20):
+        """
+        Ranked results for `query`: exact names first, then name and
+        qualified-name prefixes, then substrings, shorter names first within
+        each. Misspelled queries that match nothing get fuzzy matches.
+        Returns the total and one page of results.
+        """
+        entries, similarity = self.ranked(query)
+        results = []
+        for e, score in zip(
+            entries[offset : offset + limit].tolist(),
+            similarity[offset : offset + limit].tolist(),
+        ):
+            results.append(
+                {
+                    "id": self.ids[e],
+                    "label": self.labels[e],
+                    "kind": self.kinds[e],
+                    "qualified": self.qualified[e],
+                    "node": self.G.nodes[self.nodes[e]],
+                    "score": round(score, 2),
+                }
+            )
+        return {"total": len(entries), "results": results}
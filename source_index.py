@@ -0,0 +1,88 @@
+import os
+import mmap
+import codecs
+
+
+def line_offsets(data: bytes):
+    """
+    Byte offset at which every line of `data` starts, indexed from line 1.
+    """
+    offsets = [0, len(codecs.BOM_UTF8) if data.startswith(codecs.BOM_UTF8) else 0]
+    position = 0
+    for line in data.splitlines(keepends=True):
+        position += len(line)
+        offsets.append(position)
+    return offsets
+
+
+def node_span(node, offsets: list, data: bytes):
+    """
+    (start, end) byte offsets of a definition in `data`, decorators included.
+    AST column offsets are UTF-8 byte offsets, so no decoding is needed.
+    """
+    start = offsets[node.lineno] + node.col_offset
+    for decorator in getattr(node, "decorator_list", []):
+        line_start = offsets[decorator.lineno]
+        if line_start < start:
+            # The column of a decorator points to its expression, which may be
+            # separated from the "@" by spaces or parentheses.
+            at = data.rfind(b"@", line_start, line_start + decorator.col_offset)
+            start = max(at, line_start)
+    end = offsets[node.end_lineno] + node.end_col_offset
+    return [start, end]
+
+
+def read_span(file_path: str, start: int = 0, end: int = None):
+    """
+    Read part of a file through a memory map, so only the touched pages are loaded.
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[start:end].decode("utf-8", errors="replace")
+
+
+class SourceIndex:
+    """
+    Maps graph nodes to the (file, start byte, end byte) span of their source.
+    Source text is read from disk on demand instead of being kept in memory.
+    `spans` can be any mapping of node to span, such as a snapshot's.
+    """
+
+    def __init__(self, spans=None):
+        self.spans = {} if spans is None else spans
+
+    def __contains__(self, node):
+        return node in self.spans
+
+    def add(self, node, file_path: str, start: int = 0, end: int = None):
+        self.spans[node] = (file_path, start, end)
+
+    def remove(self, nodes):
+        for node in nodes:
+            self.spans.pop(node, None)
+
+    def add_file(self, file_path: str):
+        self.add(file_path, file_path)
+
+    def add_definitions(self, definitions: dict):
+        """
+        Add function or class entries that carry a "file" and a byte "span".
+        """
+        for node, data in definitions.items():
+            if data.get("file") and data.get("span"):
+                self.add(node, data["file"], *data["span"])
+
+    def source(self, node):
+        """
+        Source text of a node, or None if it is unknown or unreadable.
+        """
+        if node not in self.spans:
+            return None
+        try:
+            return read_span(*self.spans[node])
+        except OSError:
+            return None
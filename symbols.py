@@ -0,0 +1,362 @@
+import os
+from collections import Counter
+
+# How many re-exports ("from .mod import name" in a package) a lookup follows.
+MAX_REEXPORTS = 4
+
+
+def module_name(file_path: str, root: str):
+    """
+    Dotted module name of a file relative to the indexed root, and whether it
+    is a package ("pkg/sub/__init__.py" is the package "pkg.sub").
+    """
+    relative = os.path.splitext(os.path.relpath(file_path, root))[0]
+    parts = [part for part in relative.split(os.sep) if part not in ("", ".")]
+    is_package = bool(parts) and parts[-1] == "__init__"
+    if is_package:
+        parts.pop()
+    return ".".join(parts), is_package
+
+
+def package_prefix(root: str):
+    """
+    Dotted name of the package the indexed root sits in, "" when it is not
+    inside a package. Absolute imports of the indexed modules start with it.
+    """
+    parts = []
+    directory = os.path.abspath(root)
+    while os.path.isfile(os.path.join(directory, "__init__.py")):
+        directory, name = os.path.split(directory)
+        if not name:
+            break
+        parts.append(name)
+    return ".".join(reversed(parts))
+
+
+def qualify(module: str, name: str):
+    return f"{module}.{name}" if module and name else module or name
+
+
+class SymbolTable:
+    """
+    Per-run symbol index over the summaries of every indexed file.
+
+    Functions and classes are keyed by module-qualified names such as
+    "pkg.mod.Class.method". Each module keeps its import aliases, resolved to
+    qualified names once, so every call site resolves to a definition with a
+    few dictionary lookups:
+
+    - "self.name" and "cls.name" inside a class: the method of that class
+    - the enclosing functions' nested definitions, then the module's own
+    - names bound by "import" and "from ... import", relative imports and
+      re-exports through packages included
+    - "from ... import *" modules
+    - a bare name defined exactly once in the whole run
+
+    Calling a class resolves to its __init__. Calls that match nothing, such
+    as builtins and methods of unknown objects, are dropped.
+
+    Files can be changed afterwards with `update`, which resolves only the
+    calls that may resolve differently.
+    """
+
+    def __init__(self, summaries: list, root: str = None):
+        if root is None:
+            directories = [os.path.dirname(summary["path"]) for summary in summaries]
+            root = os.path.commonpath(directories) if directories else "."
+        self.root = root
+        self.prefix = package_prefix(root)
+        self.modules = {}
+        self.definitions = {}
+        self.classes = {}
+        self.aliases = {}
+        self.star_imports = {}
+        self.import_counts = Counter()
+        self.by_name = {}
+        # Modules importing a name, by every dotted prefix of the name, and
+        # by the exact name; modules making bare-name calls, by the name.
+        self.importers = {}
+        self.exact_importers = {}
+        self.bare_callers = {}
+        self.functions = {}
+        self.counts = {}
+        self.resolved = 0
+        self.unresolved = 0
+
+        for summary in summaries:
+            self._add(summary)
+        self.imports = set(self.import_counts)
+        for module in self.modules:
+            self._resolve(module)
+
+    def _importer_keys(self, target: str):
+        keys = [target]
+        local = self.local(target)
+        if local is not None and local != target:
+            keys.append(local)
+        return keys
+
+    def _index_import(self, module: str, target: str, add: bool):
+        update = set.add if add else set.discard
+        for key in self._importer_keys(target):
+            update(self.exact_importers.setdefault(key, set()), module)
+            parts = key.split(".")
+            for end in range(1, len(parts) + 1):
+                update(self.importers.setdefault(".".join(parts[:end]), set()), module)
+
+    def _add(self, summary: dict):
+        module, is_package = module_name(summary["path"], self.root)
+        self.modules[module] = summary
+        for local_name, data in summary["functions"].items():
+            qualified = qualify(module, local_name)
+            self.definitions[qualified] = {
+                **data,
+                "file": summary["path"],
+                "module": module,
+                "local": local_name,
+            }
+            self.by_name.setdefault(data["name"], []).append(qualified)
+            for call in data["calls"]:
+                if "." not in call:
+                    self.bare_callers.setdefault(call, set()).add(module)
+        for local_name, data in summary.get("classes", {}).items():
+            self.classes[qualify(module, local_name)] = {
+                **data,
+                "file": summary["path"],
+            }
+        self.import_counts.update(summary["imports"])
+
+        aliases = self.aliases[module] = {}
+        for local_name, (level, target, name) in summary.get("aliases", {}).items():
+            aliases[local_name] = self.absolute(
+                module, is_package, level, qualify(target, name)
+            )
+            self._index_import(module, aliases[local_name], True)
+        self.star_imports[module] = [
+            self.absolute(module, is_package, level, target)
+            for level, target in summary.get("star_imports", [])
+        ]
+        for target in self.star_imports[module]:
+            self._index_import(module, target, True)
+
+    def _remove(self, module: str):
+        summary = self.modules.pop(module)
+        for local_name, data in summary["functions"].items():
+            qualified = qualify(module, local_name)
+            self.definitions.pop(qualified, None)
+            self.functions.pop(qualified, None)
+            candidates = self.by_name.get(data["name"], [])
+            if qualified in candidates:
+                candidates.remove(qualified)
+            for call in data["calls"]:
+                self.bare_callers.get(call, set()).discard(module)
+        for local_name in summary.get("classes", {}):
+            self.classes.pop(qualify(module, local_name), None)
+        self.import_counts.subtract(summary["imports"])
+        for name in summary["imports"]:
+            if self.import_counts[name] <= 0:
+                del self.import_counts[name]
+
+        for target in self.aliases.pop(module).values():
+            self._index_import(module, target, False)
+        for target in self.star_imports.pop(module):
+            self._index_import(module, target, False)
+        resolved, unresolved = self.counts.pop(module, (0, 0))
+        self.resolved -= resolved
+        self.unresolved -= unresolved
+
+    def _resolve(self, module: str):
+        """
+        Resolve the calls of every function of a module, returning their keys.
+        """
+        resolved = unresolved = 0
+        keys = []
+        for local_name in self.modules[module]["functions"]:
+            qualified = qualify(module, local_name)
+            data = self.definitions[qualified]
+            calls = []
+            for call in data["calls"]:
+                target = self.resolve(module, local_name, data, call)
+                if target is None:
+                    unresolved += 1
+                else:
+                    resolved += 1
+                    calls.append(target)
+            self.functions[qualified] = {**data, "calls": calls}
+            keys.append(qualified)
+        old_resolved, old_unresolved = self.counts.get(module, (0, 0))
+        self.resolved += resolved - old_resolved
+        self.unresolved += unresolved - old_unresolved
+        self.counts[module] = (resolved, unresolved)
+        return keys
+
+    def _dependents(self, modules: set):
+        """
+        Modules whose calls may resolve into `modules`: importers of the
+        modules or of names in them, the packages they sit in and importers
+        of those, and modules re-exporting them, up to MAX_REEXPORTS deep.
+        """
+        dependents = set(modules)
+        frontier = set(modules)
+        for _ in range(MAX_REEXPORTS + 1):
+            found = set()
+            for module in frontier:
+                found |= self.importers.get(module, set())
+                parts = module.split(".")
+                for end in range(len(parts)):
+                    parent = ".".join(parts[:end])
+                    found |= self.exact_importers.get(parent, set())
+                    # Dotted calls in a package can name its submodules
+                    if parent in self.modules:
+                        found.add(parent)
+            frontier = found - dependents
+            if not frontier:
+                break
+            dependents |= frontier
+        return dependents
+
+    def update(self, deleted: list, summaries: list):
+        """
+        Drop the `deleted` files and replace or add the files of `summaries`.
+
+        Only calls that may resolve differently are resolved again: those of
+        the updated modules, of their dependents (see _dependents) and bare
+        calls to names the updated modules define or defined. Returns the
+        function and class keys that are gone, the function keys resolved
+        again and the class keys the updated files define.
+        """
+        changed = set()
+        names = set()
+        before = set()
+        for path in list(deleted) + [summary["path"] for summary in summaries]:
+            module = module_name(path, self.root)[0]
+            changed.add(module)
+            summary = self.modules.get(module)
+            if summary is None:
+                continue
+            for local_name, data in summary["functions"].items():
+                before.add(qualify(module, local_name))
+                names.add(data["name"])
+            before.update(qualify(module, name) for name in summary.get("classes", {}))
+            self._remove(module)
+
+        classes = set()
+        for summary in summaries:
+            module = module_name(summary["path"], self.root)[0]
+            names.update(data["name"] for data in summary["functions"].values())
+            classes.update(qualify(module, name) for name in summary.get("classes", {}))
+            self._add(summary)
+        self.imports = set(self.import_counts)
+
+        affected = self._dependents(changed)
+        for name in names:
+            affected |= self.bare_callers.get(name, set())
+        resolved = set()
+        for module in affected:
+            if module in self.modules:
+                resolved.update(self._resolve(module))
+        removed = {
+            key
+            for key in before
+            if key not in self.definitions and key not in self.classes
+        }
+        return removed, resolved, classes
+
+    def local(self, target: str):
+        """
+        An absolute dotted name as module names of the run spell it: without
+        the package prefix of the indexed root, None when it has the prefix
+        but names nothing below it.
+        """
+        if not self.prefix or not target.startswith(self.prefix):
+            return target
+        if target == self.prefix:
+            return None
+        if target[len(self.prefix)] != ".":
+            return target
+        return target[len(self.prefix) + 1 :]
+
+    @staticmethod
+    def absolute(module: str, is_package: bool, level: int, target: str):
+        """
+        Absolute dotted name of an imported target, resolving relative imports.
+        """
+        if not level:
+            return target
+        parts = module.split(".") if module else []
+        if not is_package:
+            parts = parts[:-1]
+        if level > 1:
+            parts = parts[: len(parts) - (level - 1)]
+        return qualify(".".join(parts), target)
+
+    def definition(self, qualified: str, reexports: int = 0):
+        """
+        Qualified name of the function `qualified` refers to, or None. Classes
+        resolve to their __init__, names a package re-exports are followed.
+        """
+        if qualified in self.definitions:
+            return qualified
+        if qualified in self.classes:
+            init = f"{qualified}.__init__"
+            return init if init in self.definitions else None
+        module, _, name = qualified.rpartition(".")
+        target = self.aliases.get(module, {}).get(name)
+        if target is not None and target != qualified and reexports < MAX_REEXPORTS:
+            return self.definition(target, reexports + 1)
+        return None
+
+    def imported(self, target: str):
+        """
+        Resolve an imported name. When the indexed root sits inside a package,
+        absolute imports of its modules start with the package prefix the
+        module names lack.
+        """
+        found = self.definition(target)
+        if found is None:
+            local = self.local(target)
+            if local is not None and local != target:
+                found = self.definition(local)
+        return found
+
+    def resolve(self, module: str, caller: str, data: dict, call: str):
+        """
+        Qualified name of the function a call made by `caller` (a name local
+        to `module`) refers to, or None.
+        """
+        head, _, rest = call.partition(".")
+        if head in ("self", "cls") and rest and data.get("class"):
+            found = self.definition(qualify(module, f"{data['class']}.{rest}"))
+            if found is not None:
+                return found
+
+        # Nested definitions of the enclosing functions, innermost first.
+        # Class bodies are not enclosing scopes for the functions inside them.
+        scope = caller
+        while scope:
+            if qualify(module, scope) not in self.classes:
+                found = self.definition(qualify(module, f"{scope}.{call}"))
+                if found is not None:
+                    return found
+            scope = scope.rpartition(".")[0]
+
+        found = self.definition(qualify(module, call))
+        if found is not None:
+            return found
+
+        target = self.aliases.get(module, {}).get(head)
+        if target is not None:
+            found = self.imported(qualify(target, rest))
+            if found is not None:
+                return found
+
+        for star_module in self.star_imports.get(module, ()):
+            found = self.imported(qualify(star_module, call))
+            if found is not None:
+                return found
+
+        if not rest:
+            candidates = self.by_name.get(call, ())
+            if len(candidates) == 1:
+                return candidates[0]
+        return None
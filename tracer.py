@@ -0,0 +1,370 @@
+"""
+Record which functions of a project call each other at runtime, to add the
+calls static analysis misses (dynamic dispatch, callbacks, getattr) and
+how often each one happens to the graph.
+
+    python tracer.py --directory project --output trace.json script.py args
+    python tracer.py --directory project --output trace.json -m pytest -q
+    python main.py --directory project --trace trace.json
+"""
+
+import os
+import sys
+import json
+import math
+import runpy
+import inspect
+import argparse
+import operator
+import functools
+import threading
+from array import array
+from time import perf_counter_ns
+from symbols import module_name, qualify
+
+TRACE_FORMAT = "codeflowmapper-trace"
+TRACE_VERSION = 1
+
+# Colors of traced functions from least to most called
+HEAT_COLORS = ("#FFF3B0", "#FFD166", "#F4A261", "#F77F00", "#E63946", "#D62828")
+MIN_SIZE = 7
+MAX_SIZE = 20
+
+_TRACER_FILE = os.path.abspath(__file__)
+
+
+class CallTracer:
+    """
+    Counts caller -> callee calls between the functions defined under `root`
+    while it runs, with the time spent in them.
+
+    On Python 3.12+ it listens to sys.monitoring function start and return
+    events; code outside `root` turns its events off the first time it runs,
+    so library code costs next to nothing. Older versions fall back to
+    sys.setprofile, where every Python and C call costs a callback and
+    resuming a generator counts as a call.
+
+    Functions are numbered the first time they run and keyed like the graph
+    ("pkg.mod.Class.method"); lambdas, comprehensions, class bodies and
+    module code are not, their calls are credited to the nearest traced
+    caller. Each distinct caller -> callee pair gets an edge slot with its
+    count and nanoseconds in typed arrays, and each thread keeps a flat
+    stack of (edge slot, start time), so a call costs a few list and array
+    operations and allocates nothing once its edge exists.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.backend = None
+        self.names = []
+        self.callers = array("l")
+        self.callees = array("l")
+        self.edge_calls = array("Q")
+        self.edge_nanoseconds = array("Q")
+        self._name_ids = {}
+        # Code objects hash their bytecode on every lookup, so they are keyed
+        # by id and kept alive in `_codes` to keep the ids unique.
+        self._code_ids = {}
+        self._codes = []
+        self._slots = {}
+        self._local = threading.local()
+        # Taken when a function or an edge is seen for the first time, so
+        # threads never number two of them the same.
+        self._lock = threading.Lock()
+
+    def _register(self, code):
+        """
+        Function id of a code object, -1 when it is not traced.
+        """
+        with self._lock:
+            function_id = self._code_ids.get(id(code))
+            if function_id is None:
+                function_id = self._register_code(code)
+        return function_id
+
+    def _register_code(self, code):
+        function_id = -1
+        file_path = os.path.abspath(code.co_filename)
+        qualname = getattr(code, "co_qualname", code.co_name).replace("<locals>.", "")
+        # Class bodies and module code are not optimized, functions are.
+        # Frozen and generated code has a file name like "<frozen runpy>".
+        if (
+            code.co_flags & inspect.CO_OPTIMIZED
+            and not code.co_filename.startswith("<")
+            and file_path.startswith(self.root + os.sep)
+            and file_path != _TRACER_FILE
+            and "<" not in qualname
+        ):
+            name = qualify(module_name(file_path, self.root)[0], qualname)
+            function_id = self._name_ids.get(name)
+            if function_id is None:
+                function_id = self._name_ids[name] = len(self.names)
+                self.names.append(name)
+        self._code_ids[id(code)] = function_id
+        self._codes.append(code)
+        return function_id
+
+    def _new_slot(self, key: int, callee: int):
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = len(self.callees)
+                self.callers.append((key >> 32) - 1)
+                self.callees.append(callee)
+                self.edge_calls.append(0)
+                self.edge_nanoseconds.append(0)
+                # Published last, once the columns of the slot exist
+                self._slots[key] = slot
+        return slot
+
+    def _handlers(self, disable=None):
+        """
+        enter(code, offset, count) and exit(code, ...) callbacks, which return
+        `disable` for untraced code. They run on every call, so everything
+        they touch is bound to a local first.
+        """
+        code_ids, slots, local = self._code_ids, self._slots, self._local
+        callees, edge_calls = self.callees, self.edge_calls
+        edge_nanoseconds = self.edge_nanoseconds
+        register, new_slot = self._register, self._new_slot
+
+        def enter(code, offset=None, count=1):
+            function_id = code_ids.get(id(code))
+            if function_id is None:
+                function_id = register(code)
+            if function_id < 0:
+                return disable
+            try:
+                stack = local.stack
+            except AttributeError:
+                stack = local.stack = []
+            key = (callees[stack[-2]] + 1) << 32 | function_id if stack else function_id
+            slot = slots.get(key)
+            if slot is None:
+                slot = new_slot(key, function_id)
+            edge_calls[slot] += count
+            stack.append(slot)
+            stack.append(perf_counter_ns())
+
+        def exit(code, offset=None, value=None):
+            now = perf_counter_ns()
+            function_id = code_ids.get(id(code))
+            if function_id is None:
+                function_id = register(code)
+            if function_id < 0:
+                return disable
+            stack = getattr(local, "stack", None)
+            # Frames that started before tracing have no entry to close.
+            if stack and callees[stack[-2]] == function_id:
+                edge_nanoseconds[stack[-2]] += now - stack[-1]
+                del stack[-2:]
+
+        return enter, exit
+
+    def start(self):
+        if hasattr(sys, "monitoring"):
+            try:
+                self._start_monitoring()
+                return
+            except ValueError:
+                # Another profiler holds the tool id.
+                pass
+        self._start_profile()
+
+    def _start_monitoring(self):
+        monitoring = sys.monitoring
+        events = monitoring.events
+        tool = monitoring.PROFILER_ID
+        monitoring.use_tool_id(tool, "codeflowmapper")
+        enter, exit = self._handlers(monitoring.DISABLE)
+
+        def unwind(code, offset, exception):
+            # Unwinding can not be disabled per code object.
+            exit(code)
+
+        self._callbacks = {
+            events.PY_START: enter,
+            events.PY_RESUME: functools.partial(enter, count=0),
+            events.PY_RETURN: exit,
+            events.PY_YIELD: exit,
+            events.PY_UNWIND: unwind,
+        }
+        for event, callback in self._callbacks.items():
+            monitoring.register_callback(tool, event, callback)
+        # Events a previous tracer disabled are wanted again.
+        monitoring.restart_events()
+        monitoring.set_events(tool, functools.reduce(operator.or_, self._callbacks))
+        self.backend = "sys.monitoring"
+
+    def _start_profile(self):
+        enter, exit = self._handlers()
+
+        def profile(frame, event, arg):
+            if event == "call":
+                enter(frame.f_code)
+            elif event == "return":
+                exit(frame.f_code)
+
+        threading.setprofile(profile)
+        sys.setprofile(profile)
+        self.backend = "sys.setprofile"
+
+    def stop(self):
+        if self.backend == "sys.monitoring":
+            monitoring = sys.monitoring
+            tool = monitoring.PROFILER_ID
+            monitoring.set_events(tool, 0)
+            for event in self._callbacks:
+                monitoring.register_callback(tool, event, None)
+            monitoring.free_tool_id(tool)
+        elif self.backend == "sys.setprofile":
+            sys.setprofile(None)
+            threading.setprofile(None)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def to_dict(self):
+        """
+        The trace as saved by save_trace. Edges without a caller are calls
+        from untraced code, e.g. the script's module level or a test runner.
+        Times are inclusive of callees. A function's time sums its incoming
+        edges except its direct recursive calls, which are already inside
+        the outer call's time.
+        """
+        names = self.names
+        calls = [0] * len(names)
+        nanoseconds = [0] * len(names)
+        edges = []
+        for caller, callee, count, elapsed in zip(
+            self.callers, self.callees, self.edge_calls, self.edge_nanoseconds
+        ):
+            calls[callee] += count
+            if caller != callee:
+                nanoseconds[callee] += elapsed
+            if count:
+                edges.append(
+                    {
+                        "caller": names[caller] if caller >= 0 else None,
+                        "callee": names[callee],
+                        "calls": count,
+                        "seconds": elapsed / 1e9,
+                    }
+                )
+        return {
+            "format": TRACE_FORMAT,
+            "version": TRACE_VERSION,
+            "root": self.root,
+            "backend": self.backend,
+            "python": sys.version.split()[0],
+            "functions": [
+                {"name": name, "calls": count, "seconds": elapsed / 1e9}
+                for name, count, elapsed in zip(names, calls, nanoseconds)
+            ],
+            "edges": edges,
+        }
+
+
+def run_traced(tracer: CallTracer, target: str, args=(), module: bool = False):
+    """
+    Run a script, or a module as with "python -m", under `tracer`, with
+    `args` as its command line. Returns its exit status.
+    """
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    sys.argv = [target, *args]
+    sys.path.insert(
+        0, os.getcwd() if module else os.path.dirname(os.path.abspath(target))
+    )
+    status = 0
+    tracer.start()
+    try:
+        if module:
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        else:
+            runpy.run_path(target, run_name="__main__")
+    except SystemExit as exit:
+        status = exit.code
+    finally:
+        tracer.stop()
+        sys.argv, sys.path[:] = saved_argv, saved_path
+    return status
+
+
+def save_trace(path: str, trace: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+
+
+def load_trace(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        trace = json.load(f)
+    if trace.get("format") != TRACE_FORMAT:
+        raise ValueError(f"{path} is not a call trace")
+    if trace.get("version") != TRACE_VERSION:
+        raise ValueError(
+            f"{path} is a version {trace.get('version')} trace, expected {TRACE_VERSION}"
+        )
+    return trace
+
+
+def call_counts(trace: dict):
+    """
+    Number of calls of each traced function, by qualified name.
+    """
+    return {function["name"]: function["calls"] for function in trace["functions"]}
+
+
+def call_edges(trace: dict):
+    """
+    (caller, callee, calls) of every traced call between two traced functions.
+    """
+    return [
+        (edge["caller"], edge["callee"], edge["calls"])
+        for edge in trace["edges"]
+        if edge["caller"] is not None
+    ]
+
+
+def heat_style(calls: int, max_calls: int):
+    """
+    Color and size of a function called `calls` times, on a log scale up to
+    the most called function.
+    """
+    heat = math.log1p(calls) / math.log1p(max_calls) if max_calls > 0 else 0
+    color = HEAT_COLORS[min(int(heat * len(HEAT_COLORS)), len(HEAT_COLORS) - 1)]
+    return color, round(MIN_SIZE + heat * (MAX_SIZE - MIN_SIZE))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--directory", required=True, help="Project whose functions are traced."
+    )
+    parser.add_argument("--output", default="trace.json", help="Trace file to write.")
+    parser.add_argument(
+        "-m", dest="module", action="store_true", help="Run TARGET as a module."
+    )
+    parser.add_argument("target", help="Script or module to run.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Its arguments.")
+    args = parser.parse_args()
+
+    tracer = CallTracer(args.directory)
+    status = run_traced(tracer, args.target, args.args, args.module)
+    trace = tracer.to_dict()
+    save_trace(args.output, trace)
+    print(
+        f"Traced {len(trace['functions'])} functions and {len(trace['edges'])} "
+        f"call edges with {tracer.backend}, wrote {args.output}",
+        file=sys.stderr,
+    )
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
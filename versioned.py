@@ -0,0 +1,73 @@
+import sys
+import threading
+import numpy as np
+
+
+def deep_nbytes(value, shared=()):
+    """
+    Approximate memory held by `value` and everything it references, except
+    the objects in `shared`, such as the graph it was derived from. Every
+    object is counted once; NumPy arrays count their buffers.
+    """
+    seen = {id(obj) for obj in shared}
+    total = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            total += obj.nbytes
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+            stack.extend(vars(obj).values())
+    return total
+
+
+class VersionedCache:
+    """
+    Holds a value derived from the graph and rebuilds it when the graph
+    version changes. `build` takes no arguments and reads the current graph.
+    When given, `size` measures the memory of a built value; it is only
+    called when `nbytes` is first asked for after a rebuild.
+    """
+
+    def __init__(self, build, size=None):
+        self._build = build
+        self._size = size
+        self._version = None
+        self._value = None
+        self._nbytes = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        with self._lock:
+            if self._value is None or self._version != version:
+                self._value = self._build()
+                self._version = version
+                self._nbytes = None
+            return self._value
+
+    def peek(self):
+        """
+        The value built last, or None, without building anything.
+        """
+        return self._value
+
+    def nbytes(self):
+        """
+        Memory reported by `size` for the value built last, 0 if none was.
+        """
+        with self._lock:
+            if self._value is None or self._size is None:
+                return 0
+            if self._nbytes is None:
+                self._nbytes = self._size(self._value)
+            return self._nbytes
@@ -0,0 +1,168 @@
+import os
+import time
+
+try:
+    import inotify_simple
+except ImportError:  # inotify is optional, polling works everywhere
+    inotify_simple = None
+
+
+def scan(directory: str, omit_dirs: list):
+    """
+    (modification time, size) of every Python file under `directory`.
+    """
+    snapshot = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d not in omit_dirs]
+        for file in files:
+            if file.endswith(".py"):
+                path = os.path.join(root, file)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def diff(old: dict, new: dict):
+    """
+    Added, modified and deleted paths between two snapshots.
+    """
+    added = [path for path in new if path not in old]
+    modified = [path for path in new if path in old and new[path] != old[path]]
+    deleted = [path for path in old if path not in new]
+    return added, modified, deleted
+
+
+class PollingWatcher:
+    """
+    Finds added, modified and deleted Python files by scanning the tree every
+    `interval` seconds.
+    """
+
+    def __init__(self, directory: str, omit_dirs: list, interval: float = 1.0):
+        self.directory = directory
+        self.omit_dirs = omit_dirs
+        self.interval = interval
+        self.snapshot = scan(directory, omit_dirs)
+
+    def poll(self):
+        snapshot = scan(self.directory, self.omit_dirs)
+        changes = diff(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        return changes
+
+    def wait(self):
+        """
+        Block until something changed, then return (added, modified, deleted).
+        """
+        while True:
+            time.sleep(self.interval)
+            changes = self.poll()
+            if any(changes):
+                return changes
+
+
+class InotifyWatcher(PollingWatcher):
+    """
+    Sleeps until inotify reports activity, then only re-scans the directories
+    it touched. Events are collected for `interval` seconds so an editor's
+    save turns into a single change.
+    """
+
+    def __init__(self, directory: str, omit_dirs: list, interval: float = 1.0):
+        super().__init__(directory, omit_dirs, interval)
+        flags = inotify_simple.flags
+        self.mask = (
+            flags.CREATE
+            | flags.DELETE
+            | flags.MODIFY
+            | flags.CLOSE_WRITE
+            | flags.MOVED_FROM
+            | flags.MOVED_TO
+        )
+        self.inotify = inotify_simple.INotify()
+        self.watches = {}
+        self._watch_tree(directory)
+
+    def _watch_tree(self, directory: str):
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if d not in self.omit_dirs]
+            try:
+                self.watches[self.inotify.add_watch(root, self.mask)] = root
+            except OSError:
+                continue
+
+    def wait(self):
+        flags = inotify_simple.flags
+        while True:
+            events = self.inotify.read(read_delay=int(self.interval * 1000))
+            touched = set()
+            subtrees = set()
+            overflow = False
+            for event in events:
+                if event.mask & flags.Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if event.mask & flags.IGNORED:
+                    self.watches.pop(event.wd, None)
+                    continue
+                directory = self.watches.get(event.wd)
+                if directory is None:
+                    continue
+                if event.mask & flags.ISDIR:
+                    if event.name not in self.omit_dirs:
+                        subtrees.add(os.path.join(directory, event.name))
+                else:
+                    touched.add(directory)
+
+            if overflow:
+                self._watch_tree(self.directory)
+                changes = self.poll()
+            else:
+                changes = self._rescan(touched, subtrees)
+            if any(changes):
+                return changes
+
+    def _rescan(self, touched: set, subtrees: set):
+        snapshot = {
+            path: stat
+            for path, stat in self.snapshot.items()
+            if os.path.dirname(path) not in touched
+            and not any(path.startswith(subtree + os.sep) for subtree in subtrees)
+        }
+        for directory in touched:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(directory, name)
+                if not name.endswith(".py") or not os.path.isfile(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        for subtree in subtrees:
+            if os.path.isdir(subtree):
+                self._watch_tree(subtree)
+                snapshot.update(scan(subtree, self.omit_dirs))
+        changes = diff(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        return changes
+
+
+def make_watcher(directory: str, omit_dirs: list, interval: float = 1.0):
+    """
+    An inotify watcher where inotify_simple is installed and usable, a polling
+    watcher otherwise.
+    """
+    if inotify_simple is not None:
+        try:
+            return InotifyWatcher(directory, omit_dirs, interval)
+        except OSError:
+            pass
+    return PollingWatcher(directory, omit_dirs, interval)